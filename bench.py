@@ -0,0 +1,421 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from board import *
+from compact import Grid, read_grids
+from vector import solve_batch
+"""
+Benchmarks for the solving algorithms, run with python bench.py, pass --all
+to also run the slow strategies on the adversarial and 16x16 puzzles.
+
+python bench.py --suite runs every engine over the puzzle files in
+corpora/ and reports latency percentiles, throughput and peak memory, with
+-o to save the results as json and --baseline to compare against a saved
+run, exiting with status 1 if anything got slower. Every puzzle is timed
+--repeat times and the best time kept, and only the median, throughput,
+memory and search nodes are compared, since the tail of a few dozen timings
+moves too much between runs to fail a build on.
+"""
+
+# puzzle files the suite runs, in corpora/ next to this file
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "corpora")
+CORPORA = ("easy", "hard", "seventeen", "adversarial")
+
+# a result is a regression if it is this much worse than the baseline
+THRESHOLD = 0.25
+
+# times the suite solves every puzzle, keeping the best time
+REPEAT = 3
+
+# the board bundled with solve.py and gui.py
+BUNDLED = ("602380004405070090003050000500890020249000587"
+           "030024001000040600090010708800036209")
+
+# well known puzzles that take naive backtracking a long time
+HARD = {
+    "inkala": ("800000000003600000070090200050007000000045700"
+               "000100030001000068008500010090000400"),
+    "golden nugget": ("000000039000001005003050800008090006070002000"
+                      "100400000009080050020000600400700000"),
+    "platinum blonde": ("000000012000000003002300400001800005060070800"
+                        "000009000008500000900040500470006000"),
+}
+
+# puzzles built against row major backtracking, first_empty takes minutes
+# to hours on these so it is only run on them when asked for
+ADVERSARIAL = {
+    "seventeen clue": ("000000010400000000020000000000050407008000300"
+                       "001090000300400200050100000000806000"),
+    "anti backtracking": ("000000000000003085001020000000507000004000100"
+                          "090000000500000073002010000000040009"),
+}
+
+# 16x16 puzzles made with python generate.py --box 4 --seed 11, too slow
+# for first_empty so it is only run on them when asked for
+BIG = {
+    "sixteen expert": ("B61000C4A8050D0705000000CDF1000900C00A09000B0000"
+                       "D9EF8B00000030006005000E920AC0002300006800B00G00"
+                       "004G00000300D00500000000100E074B5120E00600000000"
+                       "700900G00000BE0000F005008E000074000CB0974000500A"
+                       "000B00000072F4AC00001000E0800300100029DG000000E0"
+                       "8060A05FD9000B1G"),
+    "sixteen expert 2": ("000C410B0D000E700000000650E03090730E0009008A0F0D"
+                         "9B0002DE00400000468000E00F000D0001B020G0E600C000"
+                         "0E09F0680030005002700A000C0500000000109000500C20"
+                         "09000E00B70F60100006005A090107E0003000400E0008B9"
+                         "00000C00752000F880109F00600040GB0A0B0605C0000000"
+                         "07E000A080F39000"),
+    "sixteen hard": ("80002E000A0000002060D005EF003040C4030A0000005001"
+                     "0B50006F300G00A800C000E0B8430F00700608000900B000"
+                     "0A00500000700000B90D07000G2000CE1600094000F0A03G"
+                     "00000600000B0070000E005000A080040030AGD104000600"
+                     "F800C002G6000450G00C000000B060ED050200A6D00F0B03"
+                     "000000300082000F"),
+}
+
+STRATEGIES = {
+    "first empty": first_empty,
+    "fewest candidates": fewest_candidates,
+}
+
+
+def time_solve(line: str, strategy: Callable[[Board], Tuple[int, int]],
+               repeat: int = 1) -> Tuple[float, int]:
+    """
+    Time how long constructing a Board and finding its solution takes, and
+    count the search nodes, i.e. the number of cells the solver branched on
+    :param line: the puzzle
+    :param strategy: cell selection strategy to solve with
+    :param repeat: number of times to solve it, the best time is kept
+    :return: best time in seconds and number of nodes
+    """
+    nodes = [0]
+
+    def counted(board: Board) -> Tuple[int, int]:
+        nodes[0] += 1
+        return strategy(board)
+
+    best = None
+    for i in range(repeat):
+        nodes[0] = 0
+        board = parse(line)
+        start = time.perf_counter()
+        Board(board, counted).get_solution()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, nodes[0]
+
+
+def time_dlx(line: str, repeat: int = 1) -> Tuple[float, int]:
+    """
+    Time the dancing links engine on a puzzle, including building the matrix
+    :param line: the puzzle
+    :param repeat: number of times to solve it, the best time is kept
+    :return: best time in seconds and number of search nodes
+    """
+    best = None
+    nodes = 0
+    for i in range(repeat):
+        board = parse(line)
+        start = time.perf_counter()
+        links = DancingLinks(board)
+        links.search(1)
+        elapsed = time.perf_counter() - start
+        nodes = links.nodes
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, nodes
+
+
+def _backtrack(board: List[List[int]]) -> SolveStats:
+    return Board(board).get_stats()
+
+
+def _all_techniques(board: List[List[int]]) -> SolveStats:
+    return Board(board, techniques=ALL_TECHNIQUES).get_stats()
+
+
+def _dlx(board: List[List[int]]) -> SolveStats:
+    return Board(board, engine=DLX).get_stats()
+
+
+def _vector(board: List[List[int]]) -> SolveStats:
+    stats = SolveStats("vector")
+    solve_batch(np.array([board], dtype=np.uint8), stats=stats)
+    return stats
+
+
+def _vector_batch(grids: List[Grid]) -> None:
+    cells = b"".join(grid.to_bytes() for grid in grids)
+    solve_batch(np.frombuffer(cells, dtype=np.uint8).reshape(-1, 9, 9))
+
+
+# engines the suite runs, each solves one board and returns its stats
+SUITE_ENGINES = {
+    "backtrack": _backtrack,
+    "all techniques": _all_techniques,
+    "dlx": _dlx,
+    "vector": _vector,
+}
+
+# engines that solve a whole corpus at once faster than one board at a
+# time, their throughput and memory are measured on the whole corpus
+BATCH = {
+    "vector": _vector_batch,
+}
+
+
+def load_corpus(name: str, limit: int = None) -> List[Grid]:
+    """
+    Read a puzzle file from corpora/, holding every puzzle as a compact
+    Grid until it is solved
+    :param name: name of the file without .txt, e.g. one of CORPORA
+    :param limit: only read this many puzzles
+    :return: the grids
+    """
+    grids = []
+    for grid in read_grids(os.path.join(CORPORA_DIR, name + ".txt")):
+        if limit is not None and len(grids) >= limit:
+            break
+        grids.append(grid)
+    return grids
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Nearest rank percentile
+    :param values: the values, in any order
+    :param percent: percentile to find, 0 to 100
+    :return: the smallest value at least percent of the values are at or
+    below, 0 if there are none
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def bench_engine(boards: List[Grid], engine: str,
+                 repeat: int = REPEAT) -> dict:
+    """
+    Time an engine on every board one at a time, then measure its peak
+    memory with tracemalloc in a second pass, so tracing does not slow the
+    timed pass. Every board is unpacked from its grid before its timing
+    starts.
+    :param boards: the puzzles
+    :param engine: one of SUITE_ENGINES
+    :param repeat: number of times to solve every board, the best time of
+    each is kept
+    :return: puzzles, solved, nodes, p50/p95/p99/max/mean milliseconds,
+    throughput in puzzles per second and peak memory in KiB
+    """
+    solver = SUITE_ENGINES[engine]
+    # warm up first, so building lookup tables is not timed
+    for grid in boards[:1]:
+        solver(grid.rows())
+    # whole passes over the boards rather than each board several times in
+    # a row, so a moment the machine is busy costs one timing of a board
+    # and not all of them
+    latencies = [None] * len(boards)
+    nodes = 0
+    solved = 0
+    for i in range(repeat):
+        nodes = 0
+        solved = 0
+        for j, grid in enumerate(boards):
+            board = grid.rows()
+            start = time.perf_counter()
+            stats = solver(board)
+            elapsed = time.perf_counter() - start
+            if latencies[j] is None or elapsed < latencies[j]:
+                latencies[j] = elapsed
+            nodes += stats.nodes
+            solved += stats.solved
+    total = sum(latencies)
+    if engine in BATCH:
+        total = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            BATCH[engine](boards)
+            elapsed = time.perf_counter() - start
+            if total is None or elapsed < total:
+                total = elapsed
+
+    tracemalloc.start()
+    if engine in BATCH:
+        BATCH[engine](boards)
+    else:
+        for grid in boards:
+            solver(grid.rows())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "puzzles": len(boards),
+        "solved": solved,
+        "nodes": nodes,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "mean_ms": total / len(boards) * 1000 if boards else 0.0,
+        "throughput": len(boards) / total if total else 0.0,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_suite(engines: Iterable[str] = tuple(SUITE_ENGINES),
+              corpora: Iterable[str] = CORPORA,
+              limit: int = None, repeat: int = REPEAT) -> dict:
+    """
+    Run engines over corpora, printing a row per engine as it finishes
+    :param engines: names from SUITE_ENGINES
+    :param corpora: names of puzzle files in corpora/
+    :param limit: only run this many puzzles of each corpus
+    :param repeat: number of times to solve each puzzle, the best time is
+    kept
+    :return: the results, with the machine they ran on, as saved to json
+    """
+    row = "{:<14}{:<16}{:>10}{:>10}{:>10}{:>12}{:>12}{:>10}"
+    print(row.format("corpus", "engine", "p50 ms", "p95 ms", "p99 ms",
+                     "puzzles/s", "peak KiB", "nodes"))
+    results = {}
+    for corpus in corpora:
+        boards = load_corpus(corpus, limit)
+        results[corpus] = {}
+        for engine in engines:
+            result = bench_engine(boards, engine, repeat)
+            results[corpus][engine] = result
+            print(row.format(corpus, engine,
+                             "{:.2f}".format(result["p50_ms"]),
+                             "{:.2f}".format(result["p95_ms"]),
+                             "{:.2f}".format(result["p99_ms"]),
+                             "{:.1f}".format(result["throughput"]),
+                             "{:.0f}".format(result["peak_kib"]),
+                             result["nodes"]))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "limit": limit,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict,
+            threshold: float = THRESHOLD) -> List[str]:
+    """
+    Compare suite results against an earlier run. A median latency or
+    memory that grew, or throughput that shrank, by more than threshold is
+    a regression, and so is any growth in search nodes, which does not
+    depend on the machine. p95 and p99 are not compared, with a few dozen
+    puzzles they are one or two timings and change too much between runs.
+    :param results: results of run_suite
+    :param baseline: results of an earlier run_suite
+    :param threshold: fraction a value may get worse by, e.g. 0.25
+    :return: a line describing every regression
+    """
+    regressions = []
+    for corpus, engines in results["results"].items():
+        for engine, result in engines.items():
+            old = baseline["results"].get(corpus, {}).get(engine)
+            if old is None or old["puzzles"] != result["puzzles"]:
+                continue
+            for key in ("p50_ms", "peak_kib"):
+                if result[key] > old[key] * (1 + threshold):
+                    regressions.append("{} {} {}: {:.2f} -> {:.2f}".format(
+                        corpus, engine, key, old[key], result[key]))
+            if result["throughput"] * (1 + threshold) < old["throughput"]:
+                regressions.append("{} {} throughput: {:.1f} -> {:.1f}".format(
+                    corpus, engine, old["throughput"], result["throughput"]))
+            if result["nodes"] > old["nodes"]:
+                regressions.append("{} {} nodes: {} -> {}".format(
+                    corpus, engine, old["nodes"], result["nodes"]))
+    return regressions
+
+
+def suite(args: argparse.Namespace) -> int:
+    """
+    Run the suite from the command line, saving and comparing results
+    :param args: parsed command line arguments
+    :return: exit status, 1 if there were regressions
+    """
+    results = run_suite(args.engines or tuple(SUITE_ENGINES),
+                        args.corpora or CORPORA, args.limit, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print("regression: " + line, file=sys.stderr)
+    if not regressions:
+        print("no regressions against " + args.baseline, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the solvers.")
+    parser.add_argument("--all", action="store_true",
+                        help="also run the slow strategies on the "
+                             "adversarial and 16x16 puzzles")
+    parser.add_argument("--suite", action="store_true",
+                        help="run every engine over the puzzle files in "
+                             "corpora/")
+    parser.add_argument("--engines", nargs="+", choices=tuple(SUITE_ENGINES),
+                        help="engines the suite runs, defaults to all")
+    parser.add_argument("--corpora", nargs="+",
+                        help="puzzle files the suite runs, defaults to "
+                             + ", ".join(CORPORA))
+    parser.add_argument("--limit", type=int, default=None,
+                        help="only run this many puzzles of each corpus")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help="times the suite solves each puzzle, the best "
+                             "time is kept")
+    parser.add_argument("-o", "--output", default=None,
+                        help="save the suite results to a json file")
+    parser.add_argument("--baseline", default=None,
+                        help="json file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="fraction a result may get worse by before it "
+                             "is a regression")
+    args = parser.parse_args()
+    if args.suite:
+        sys.exit(suite(args))
+
+    slow = args.all
+    row = "{:<20}{:<20}{:>12}{:>12}"
+    print(row.format("puzzle", "solver", "seconds", "nodes"))
+    puzzles = dict(HARD)
+    puzzles.update(ADVERSARIAL)
+    puzzles.update(BIG)
+    for name, line in [("bundled", BUNDLED)] + list(puzzles.items()):
+        for strategy in STRATEGIES:
+            if (name in ADVERSARIAL or name in BIG) and \
+                    STRATEGIES[strategy] is first_empty and not slow:
+                continue
+            repeat = 5 if name == "bundled" else 1
+            seconds, nodes = time_solve(line, STRATEGIES[strategy], repeat)
+            print(row.format(name, strategy, "{:.4f}".format(seconds),
+                             nodes))
+        seconds, nodes = time_dlx(line, 5 if name == "bundled" else 1)
+        print(row.format(name, "dancing links", "{:.4f}".format(seconds),
+                         nodes))
+
+
+if __name__ == '__main__':
+    main()
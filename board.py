@@ -1,52 +1,167 @@
 from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
 from square import *
-from numpy import transpose
+from math import isqrt
+from typing import Callable, Iterator, Optional
+from logic import *
+from dlx import *
+from puzzle_io import *
+from stats import *
+from cache import *
+from hints import *
+from history import *
+
+# solver engines, see Board.set_solution
+BACKTRACK = "backtrack"
+DLX = "dlx"
+ENGINES = (BACKTRACK, DLX)
+
+# number of set bits for every 9-bit mask
+BIT_COUNT = [bin(i).count("1") for i in range(512)]
 
 
 class Board:
     """
-    A class to represent the board we will be playing a sudoku game on.
+    A class to represent the board we will be playing a sudoku game on. The
+    usual board is 9x9 with 3x3 squares, but any size x size board with
+    box x box squares works, with size = box * box, e.g. 16x16 or 25x25.
 
     ---Attributes---
-    _original_board: the original board passed in as an argument
-    _solution: the solution to this board
+    _box: side of a square
+    _size: side of the board, also the largest number
+    _layout: units and peers of the board
+    _original_board: a copy of the original board passed in as an argument,
+    so changing the list passed in afterwards does not change it
+    _solution: the solution to this board, found the first time it is
+    needed
+    _solved: whether the solution has been looked for yet
+    _solving: makes sure the solution is only looked for once, when it is
+    needed and by a background thread at the same time
     _board: the board we will operate on
-    _notes: the notes board used to jot down notes
-    _squares: the 9 squares of the board
-    _transpose: transpose of the board so we can check columns easily
+    _notes: the notes board used to jot down notes, a mask of candidate
+    numbers for every cell, bit i stands for the number i + 1
+    _noting: whether notes have been jotted down, so placing a number has
+    notes to prune from its peers, boards only used for solving skip it
+    _auto_notes: whether the notes are kept as every legal candidate
+    _squares: the squares of the board, as views on _board
+    _rows: occupancy mask of the numbers used in each row, bit i stands for
+    the number i + 1
+    _cols: occupancy mask of the numbers used in each column
+    _boxes: occupancy mask of the numbers used in each square, indexed row
+    major from the top left square
+    _filled: number of filled cells
+    _conflicts: number of times a number repeats in a row, column or square,
+    kept up to date with the masks so checking the board costs nothing
+    _strategy: picks the empty cell the solver branches on next
+    _propagator: fills in the cells that can be deduced before every guess
+    _engine: the solver engine used to find the solution
+    _hook: receives the solver's events, None for no hook
+    _cache: solutions of puzzles seen before, None for no cache
+    _limits: when to give up looking for the solution, None to look until
+    it is found
+    _stats: the work done the last time the solution was found
+    _hints: finds hints for the player, made the first time one is asked for
+    _history: the player's moves, made the first time it is asked for
     """
 
+    _box: int
+    _size: int
+    _layout: Layout
     _original_board: List[List[int]]
     _solution: List[List[int]]
+    _solved: bool
+    _solving: threading.Lock
     _board: List[List[int]]
     _notes: List[List[int]]
+    _noting: bool
+    _auto_notes: bool
     _squares = List[Square]
-    _transpose = List[List[int]]
+    _rows: List[int]
+    _cols: List[int]
+    _boxes: List[int]
+    _filled: int
+    _conflicts: int
+    _strategy: Callable[[Board], Tuple[int, int]]
+    _propagator: Propagator
+    _engine: str
+    _hook: Optional[SolverHook]
+    _cache: Optional[SolutionCache]
+    _limits: Optional[Limits]
+    _stats: SolveStats
+    _hints: Optional[HintEngine]
+    _history: Optional[History]
 
-    def __init__(self, board: List[List[int]]):
+    def __init__(self, board: List[List[int]],
+                 strategy: Callable[[Board], Tuple[int, int]] = None,
+                 techniques: Tuple[str, ...] = SINGLES,
+                 engine: str = BACKTRACK, hook: SolverHook = None,
+                 cache: SolutionCache = None, background: bool = False,
+                 limits: Limits = None):
         """
         the board we are playing with
-        :param board: numbers for the board
+        :param board: numbers for the board, 9 rows of 9 numbers for the usual
+        board, or size rows of size numbers for a bigger one
+        :param strategy: cell selection strategy used when solving, defaults
+        to fewest_candidates
+        :param techniques: logical techniques applied before and during the
+        search, see logic.py, pass () for pure backtracking
+        :param engine: solver engine used to find the solution, one of ENGINES
+        :param hook: receives events while the solution is found, e.g. for
+        tracing or profiling
+        :param cache: solutions of puzzles seen before, looked up before
+        solving and filled in after
+        :param background: start looking for the solution in a background
+        thread right away, otherwise it is only looked for the first time
+        it is needed, so loading a board to show or check it costs nothing
+        :param limits: deadline, node budget or cancellation token after
+        which looking for the solution gives up, see set_limits
         """
-        self._original_board = board
+        self._size = len(board)
+        self._box = isqrt(self._size)
+        if self._box * self._box != self._size or any(
+                len(row) != self._size for row in board):
+            raise ValueError("a board must be size x size with size a square "
+                             "number, got {} rows".format(self._size))
+        self._layout = layout(self._box)
+        self._original_board = [list(row) for row in board]
         self._solution = []
+        self._solved = False
+        self._solving = threading.Lock()
         self._board = []
         self._notes = []
+        self._noting = False
+        self._auto_notes = False
         self._squares = []
-        self._transpose = transpose(board)
-
-        sqr = self._dissect(board)
-        for i in range(3):
-            row = [Square(sqr[i * 3]),
-                   Square(sqr[i * 3 + 1]),
-                   Square(sqr[i * 3 + 2])]
-            self._squares.append(row)
+        self._rows = [0] * self._size
+        self._cols = [0] * self._size
+        self._boxes = [0] * self._size
+        self._filled = 0
+        self._conflicts = 0
+        self._strategy = strategy or fewest_candidates
+        self._propagator = Propagator(self, techniques, hook)
+        self._engine = engine
+        self._hook = hook
+        self._cache = cache
+        self._limits = limits
+        self._stats = SolveStats(engine)
+        self._hints = None
+        self._history = None
 
         for item in board:
             self._board.append(item.copy())
-            self._notes.append(item.copy())
+            self._notes.append([0] * self._size)
+
+        box = self._box
+        for i in range(box):
+            row = [Square(self._board, i * box, j * box, box)
+                   for j in range(box)]
+            self._squares.append(row)
 
-        self.set_solution()
+        self._build_masks()
+        if background:
+            self.solve_in_background()
 
     def get_board(self) -> List[List[int]]:
         """
@@ -55,9 +170,24 @@ class Board:
         """
         return self._board
 
+    def get_size(self) -> int:
+        """
+        return the side of the board, which is also the largest number
+        :return: 9 for the usual board
+        """
+        return self._size
+
+    def get_box(self) -> int:
+        """
+        return the side of a square
+        :return: 3 for the usual board
+        """
+        return self._box
+
     def get_notes(self) -> List[List[int]]:
         """
-        return the notes
+        return the notes, a mask of candidate numbers for every cell, bit i
+        stands for the number i + 1
         :return: notes
         """
         return self._notes
@@ -71,57 +201,65 @@ class Board:
         :param number: number to fill with
         :return: true on success false otherwise
         """
-        if self._board[row][col] != 0:
-            return False
-        if 0 <= row < 9 and 0 <= col < 9:
-            if number and 0 < number < 10:
-                for item in self._board[row]:
-                    if item == number:
-                        return False
-                for item in self._board:
-                    if item[col] == number:
-                        return False
-                sqr_row = row // 3
-                sqr_col = col // 3
-                x = row % 3
-                y = col % 3
-                if self._squares[sqr_row][sqr_col].fill(x, y, number):
-                    self._board[row][col] = number
-                    return True
+        size = self._size
+        if 0 <= row < size and 0 <= col < size:
+            if self._board[row][col] != 0:
+                return False
+            if number and 0 < number <= size:
+                bit = 1 << (number - 1)
+                box = row // self._box * self._box + col // self._box
+                if (self._rows[row] | self._cols[col] | self._boxes[box]) & bit:
+                    return False
+                self._place(row, col, number)
+                return True
         return False
 
-    def fill_solution(self, row: int, col: int, number: int = None) -> bool:
+    def fill_solution(self, row: int, col: int,
+                      number: int = None) -> Optional[bool]:
         """
         This is fill but used for the player, it checks of the move is correct
         directly against the solution board which we found using backtracking
-        when initializing.
+        when initializing. Without a number the cell's note is checked, if
+        it has exactly one.
         :param row: row of cell
         :param col: col of cell
         :param number: number to fill
-        :return: True if the move is correct, false otherwise
+        :return: True if the move is correct, False if it is not, None if no
+        single number was checked, e.g. the cell is filled, has no note or
+        several notes, or the board has no solution
         """
         if self._board[row][col] != 0:
             print("That's filled")
-            return False
-        if 0 <= row < 9 and 0 <= col < 9:
-            if number and 0 < number < 10:
-                if self._solution[row][col] == number:
-                    self._board[row][col] = number
+            return None
+        solution = self.get_solution()
+        if not solution:
+            print("This board has no solution")
+            return None
+        if 0 <= row < self._size and 0 <= col < self._size:
+            if number and 0 < number <= self._size:
+                if solution[row][col] == number:
+                    self._place(row, col, number)
                     self._notes[row][col] = 0
                     print("That's correct")
                     return True
                 print("That's incorrect")
+                return False
             elif number is None:
-                if self._notes[row][col] == 0:
+                notes = self._notes[row][col]
+                if notes == 0:
                     print("No number entered")
-                    return False
-                if self._solution[row][col] == self._notes[row][col]:
-                    self._board[row][col] = self._notes[row][col]
+                    return None
+                if notes & (notes - 1):
+                    print("More than one note entered")
+                    return None
+                if solution[row][col] == notes.bit_length():
+                    self._place(row, col, notes.bit_length())
                     self._notes[row][col] = 0
                     print("That's correct")
                     return True
                 print("That's incorrect")
-        return False
+                return False
+        return None
 
     def get(self, row: int, col: int) -> int:
         """
@@ -130,7 +268,7 @@ class Board:
         :param col: col of cell
         :return: number at that cell
         """
-        if 0 <= row < 9 and 0 <= col < 9:
+        if 0 <= row < self._size and 0 <= col < self._size:
             return self._board[row][col]
 
     def clear(self, row: int, col: int) -> None:
@@ -140,38 +278,253 @@ class Board:
         :param col: col of cell
         :return: None
         """
-        if 0 <= row < 9 and 0 <= col < 9:
+        if 0 <= row < self._size and 0 <= col < self._size:
+            number = self._board[row][col]
             self._board[row][col] = 0
-            sqr_row = row // 3
-            sqr_col = col // 3
-            x = row % 3
-            y = col % 3
-            self._squares[sqr_row][sqr_col].clear(x, y)
+            if number:
+                self._filled -= 1
+            if number and self._conflicts:
+                # another copy of the number may still be in the row, column
+                # or square, which the masks can not tell
+                self._build_masks()
+            elif number:
+                mask = ~(1 << (number - 1))
+                self._rows[row] &= mask
+                self._cols[col] &= mask
+                self._boxes[row // self._box * self._box
+                            + col // self._box] &= mask
+            if number and self._auto_notes:
+                self._restore_notes(row, col, number)
+
+    def _restore_notes(self, row: int, col: int, number: int) -> None:
+        """
+        give a cell that was just cleared its candidates back, and give the
+        number it held back to the empty peers it is legal in again
+        :param row: row of the cleared cell
+        :param col: col of the cleared cell
+        :param number: number it held
+        :return: None
+        """
+        bit = 1 << (number - 1)
+        notes = self._notes
+        board = self._board
+        notes[row][col] = self._free(row, col)
+        for r, c in self._layout.peer_pairs[row][col]:
+            if not board[r][c] and self._free(r, c) & bit:
+                notes[r][c] |= bit
+
+    def candidates(self, row: int, col: int) -> List[int]:
+        """
+        return the numbers that can legally be filled into the given cell
+        :param row: row of cell
+        :param col: col of cell
+        :return: legal numbers in ascending order, empty if the cell is filled
+        """
+        size = self._size
+        if 0 <= row < size and 0 <= col < size and self._board[row][col] == 0:
+            free = self._free(row, col)
+            return [i + 1 for i in range(size) if free & (1 << i)]
+        return []
+
+    def candidate_mask(self, row: int, col: int) -> int:
+        """
+        return the numbers that can legally be filled into the given cell as
+        a mask, bit i stands for the number i + 1
+        :param row: row of cell
+        :param col: col of cell
+        :return: mask of legal numbers, 0 if the cell is filled
+        """
+        size = self._size
+        if 0 <= row < size and 0 <= col < size and self._board[row][col] == 0:
+            return self._free(row, col)
+        return 0
+
+    def _free(self, row: int, col: int) -> int:
+        """
+        return the mask of numbers not yet used by the row, column and square
+        of the given cell, bit i stands for the number i + 1
+        :param row: row of cell
+        :param col: col of cell
+        :return: mask of legal numbers
+        """
+        box = self._box
+        used = (self._rows[row] | self._cols[col]
+                | self._boxes[row // box * box + col // box])
+        return ~used & self._layout.full
+
+    def _place(self, row: int, col: int, number: int) -> None:
+        """
+        write a number into an empty cell of the game board and mark it in the
+        occupancy masks, the solver checks legality before calling this, but a
+        right answer from the player can still clash with a wrong one, so any
+        conflict it makes is counted
+        :param row: row of cell
+        :param col: col of cell
+        :param number: number to write
+        :return: None
+        """
+        bit = 1 << (number - 1)
+        box = row // self._box * self._box + col // self._box
+        self._board[row][col] = number
+        self._filled += 1
+        if (self._rows[row] | self._cols[col] | self._boxes[box]) & bit:
+            self._conflicts += ((self._rows[row] & bit != 0)
+                                + (self._cols[col] & bit != 0)
+                                + (self._boxes[box] & bit != 0))
+        self._rows[row] |= bit
+        self._cols[col] |= bit
+        self._boxes[box] |= bit
+        if self._noting:
+            # the number is no longer a candidate anywhere it can see
+            notes = self._notes
+            notes[row][col] = 0
+            mask = ~bit
+            for r, c in self._layout.peer_pairs[row][col]:
+                notes[r][c] &= mask
+
+    def _build_masks(self) -> bool:
+        """
+        recompute the row, column and square occupancy masks, the filled
+        cells and the conflicts from scratch from the current game board
+        :return: false if a number appears twice in a row, column or square
+        """
+        size = self._size
+        rows = self._rows = [0] * size
+        cols = self._cols = [0] * size
+        boxes = self._boxes = [0] * size
+        filled = 0
+        conflicts = 0
+        for row in range(size):
+            for col in range(size):
+                number = self._board[row][col]
+                if number:
+                    bit = 1 << (number - 1)
+                    box = row // self._box * self._box + col // self._box
+                    filled += 1
+                    conflicts += ((rows[row] & bit != 0)
+                                  + (cols[col] & bit != 0)
+                                  + (boxes[box] & bit != 0))
+                    rows[row] |= bit
+                    cols[col] |= bit
+                    boxes[box] |= bit
+        self._filled = filled
+        self._conflicts = conflicts
+        return conflicts == 0
+
+    def is_valid(self) -> bool:
+        """
+        Check that no number appears twice in a row, column or square of the
+        game board, empty cells are allowed. The conflicts are counted as
+        numbers are filled in and cleared, so this costs nothing.
+        :return: true if valid, false otherwise
+        """
+        return self._conflicts == 0
+
+    def is_complete(self) -> bool:
+        """
+        Check that every cell of the game board is filled, legally or not
+        :return: true if there is no empty cell, false otherwise
+        """
+        return self._filled == self._layout.cells
+
+    def get_conflicts(self) -> int:
+        """
+        return how many times a number repeats in a row, column or square of
+        the game board, a number in three units with one copy each counts
+        three times
+        :return: number of conflicts, 0 for a valid board
+        """
+        return self._conflicts
 
     def clear_notes(self, row: int, col: int) -> None:
         """
-        set the number at the given cell in the notes board to be 0
+        remove every note in the given cell
         :param row: row of cell
         :param col: col of cell
         :return: None
         """
-        if 0 <= row < 9 and 0 <= col < 9:
+        if 0 <= row < self._size and 0 <= col < self._size:
             self._notes[row][col] = 0
 
     def fill_notes(self, row: int, col: int, number: int) -> bool:
         """
-        fill the given cell with the given number in the notes board
+        add the given number to the notes of the given cell
         :param row: row of cell
         :param col: col of cell
         :param number: number to fill
         :return: true on success false otherwise
         """
-        if 0 <= row < 9 and 0 <= col < 9 and 0 < number < 10:
+        size = self._size
+        if 0 <= row < size and 0 <= col < size and 0 < number <= size:
             if self._board[row][col] == 0:
-                self._notes[row][col] = number
+                self._notes[row][col] |= 1 << (number - 1)
+                self._noting = True
                 return True
         return False
 
+    def remove_note(self, row: int, col: int, number: int) -> bool:
+        """
+        remove the given number from the notes of the given cell
+        :param row: row of cell
+        :param col: col of cell
+        :param number: number to remove
+        :return: true if it was a note, false otherwise
+        """
+        size = self._size
+        if 0 <= row < size and 0 <= col < size and 0 < number <= size:
+            bit = 1 << (number - 1)
+            if self._notes[row][col] & bit:
+                self._notes[row][col] &= ~bit
+                return True
+        return False
+
+    def has_note(self, row: int, col: int, number: int) -> bool:
+        """
+        Check whether the given number is in the notes of the given cell
+        :param row: row of cell
+        :param col: col of cell
+        :param number: number to look for
+        :return: true if it is, false otherwise
+        """
+        if 0 <= row < self._size and 0 <= col < self._size and number > 0:
+            return bool(self._notes[row][col] >> (number - 1) & 1)
+        return False
+
+    def set_auto_notes(self, auto: bool) -> None:
+        """
+        Turn auto notes on or off. While on, the notes of every empty cell
+        are its legal candidates, filling a number removes it from the notes
+        of its peers and clearing it gives it back, one peer at a time
+        instead of working the whole board out again. Turning it off
+        removes every note.
+        :param auto: whether to turn auto notes on
+        :return: None
+        """
+        self._auto_notes = auto
+        self._noting = self._noting or auto
+        self._fill_auto_notes()
+
+    def auto_notes(self) -> bool:
+        """
+        Check whether auto notes are on
+        :return: true if they are, false otherwise
+        """
+        return self._auto_notes
+
+    def _fill_auto_notes(self) -> None:
+        """
+        set the notes of every empty cell to its legal candidates if auto
+        notes are on, otherwise remove every note
+        :return: None
+        """
+        size = self._size
+        for row in range(size):
+            for col in range(size):
+                if self._auto_notes and not self._board[row][col]:
+                    self._notes[row][col] = self._free(row, col)
+                else:
+                    self._notes[row][col] = 0
+
     def find_empty(self) -> Tuple[int, int]:
         """
         Find the next empty position on the game board, used for solving
@@ -188,64 +541,429 @@ class Board:
             row_index += 1
         return -1, -1
 
+    def set_strategy(self,
+                     strategy: Callable[[Board], Tuple[int, int]]) -> None:
+        """
+        change the cell selection strategy used by the solvers
+        :param strategy: a function taking this board and returning the
+        position of the empty cell to branch on, or (-1, -1) if there is none
+        :return: None
+        """
+        self._strategy = strategy
+
+    def set_techniques(self, techniques: Tuple[str, ...]) -> None:
+        """
+        change the logical techniques applied when solving
+        :param techniques: names of techniques from logic.py, easiest first
+        :return: None
+        """
+        self._propagator.techniques = techniques
+
+    def get_solution(self) -> List[List[int]]:
+        """
+        return the solution, finding it first if it has not been yet, or
+        waiting for the background thread looking for it
+        :return: solved board, empty if the board has no solution
+        """
+        self._need_solution()
+        return self._solution
+
+    def solution_ready(self) -> bool:
+        """
+        Check whether the solution has been looked for, so get_solution
+        will not have to solve the board or wait
+        :return: true if it has, false otherwise
+        """
+        return self._solved
+
+    def solve_in_background(self) -> threading.Thread:
+        """
+        start looking for the solution in a background thread, the board can
+        be played on meanwhile
+        :return: the thread
+        """
+        thread = threading.Thread(target=self._need_solution, daemon=True)
+        thread.start()
+        return thread
+
+    def _need_solution(self) -> None:
+        """
+        look for the solution of the original board if it has not been yet.
+        It is found on a copy of the original board, so whatever was played
+        on this one meanwhile is left alone.
+        :return: None
+        """
+        if self._solved:
+            return
+        with self._solving:
+            if self._solved:
+                return
+            copy = Board(self._original_board, self._strategy,
+                         self._propagator.techniques, self._engine,
+                         self._hook, self._cache, limits=self._limits)
+            copy._set_solution(self._engine)
+            self._solution = copy._solution
+            self._stats = copy._stats
+            for technique, count in copy._propagator.counts.items():
+                self._propagator.counts[technique] += count
+            self._solved = True
+
+    def set_limits(self, limits: Optional[Limits]) -> None:
+        """
+        change when looking for the solution gives up. If it gave up last
+        time, it is looked for again with the new limits the next time it is
+        needed, otherwise a board that gave up keeps its empty solution.
+        :param limits: deadline, node budget or cancellation token, None to
+        look until the solution is found
+        :return: None
+        """
+        with self._solving:
+            self._limits = limits
+            if self._stats.gave_up:
+                self._solved = False
+
+    def gave_up(self) -> Optional[str]:
+        """
+        return why looking for the solution gave up, which tells an empty
+        solution that ran out of time or nodes, or was cancelled, apart from
+        a puzzle with no solution
+        :return: OUT_OF_TIME, OUT_OF_NODES or CANCELLED, None if it did not
+        give up
+        """
+        self._need_solution()
+        return self._stats.gave_up
+
+    def get_nodes(self) -> int:
+        """
+        return the number of search nodes visited the last time the solution
+        was found
+        :return: number of nodes
+        """
+        self._need_solution()
+        return self._stats.nodes
+
+    def get_stats(self) -> SolveStats:
+        """
+        return the work done the last time the solution was found: nodes,
+        backtracks, depth, time per phase and technique counts
+        :return: the stats
+        """
+        self._need_solution()
+        return self._stats
+
+    def get_technique_counts(self) -> Dict[str, int]:
+        """
+        return how many times each logical technique made progress while
+        solving this board
+        :return: technique name to count
+        """
+        self._need_solution()
+        return self._propagator.counts
+
+    def hint(self) -> Optional[Hint]:
+        """
+        Find the easiest cell the player can fill in by logic alone, with
+        the number, the technique and the cells that prove it, see hints.py.
+        What was worked out for the last hint is kept, so asking again after
+        a move is cheap.
+        :return: the hint, None if no cell can be filled in without guessing
+        """
+        if self._hints is None:
+            self._hints = HintEngine(self)
+        return self._hints.hint()
+
+    def get_history(self) -> History:
+        """
+        return the history of the player's moves, for undo, redo and
+        snapshots, see history.py. It starts from the board as it is the
+        first time it is asked for.
+        :return: the history
+        """
+        if self._history is None:
+            self._history = History(self)
+        return self._history
+
+    def _put_cells(self, cells: List[Tuple[int, int, int, int]],
+                   auto: bool) -> None:
+        """
+        write numbers and notes straight into cells, without checking the
+        rules and without pruning or giving back the notes of their peers,
+        used by History to move between states
+        :param cells: (row, col, number, notes) of every cell to write
+        :param auto: whether auto notes are on afterwards
+        :return: None
+        """
+        self._auto_notes = False
+        noting = self._noting
+        self._noting = False
+        for row, col, number, notes in cells:
+            if self._board[row][col] != number:
+                self.clear(row, col)
+                if number:
+                    self._place(row, col, number)
+        for row, col, number, notes in cells:
+            self._notes[row][col] = notes
+            noting = noting or notes != 0
+        self._noting = noting or auto
+        self._auto_notes = auto
+
+    @contextmanager
+    def searching(self) -> Iterator[None]:
+        """
+        Search inside a with block without touching the notes: numbers
+        filled and cleared in it neither prune their peers' notes nor give
+        them back, so a search that backtracks or gives up leaves the
+        player's notes as they were
+        :return: None
+        """
+        noting = self._noting
+        auto = self._auto_notes
+        self._noting = False
+        self._auto_notes = False
+        try:
+            yield
+        finally:
+            self._noting = noting
+            self._auto_notes = auto
+
+    def select_cell(self) -> Tuple[int, int]:
+        """
+        Pick the empty cell to try numbers in next, using the board's cell
+        selection strategy
+        :return: position of that cell, (-1, -1) if the board is full
+        """
+        return self._strategy(self)
+
     def check_win(self) -> bool:
         """
-        Check if we're in a winning state, i.e. all cells filled legally
+        Check if we're in a winning state, i.e. all cells filled legally.
+        The filled cells and the conflicts are counted as the board changes,
+        so this costs nothing.
         :return: True if won, false otherwise
         """
-        empty = self.find_empty()
-        if empty[0] != -1:
-            return False
-        for item in self._squares:
-            for sqr in item:
-                if not sqr.validate():
-                    return False
-        for row in self._board:
-            if not self.validate_list(row):
-                return False
-        for col in self._transpose:
-            if not self.validate_list(col):
-                return False
-        return True
+        return self.is_complete() and self.is_valid()
 
-    def set_solution(self) -> bool:
+    def set_solution(self, engine: str = None) -> bool:
         """
         Given that a board is solved, move this board to be stored in
         self.solution for checking later. And then reset the playing board.
         This is necessary because the initial solve operates on the playing
         board, so the solved board needs to be moved elsewhere in order
         to allow this this board for further operations.
+        The dancing links engine solves a copy, so it leaves the playing
+        board alone. Boards are not solved when they are made, get_solution
+        solves the original board the first time it is needed, this solves
+        the playing board as it is now, e.g. with another engine. With a
+        cache the solution of a puzzle seen before is
+        taken from it, and a new one is added to it. If the board's limits
+        run out first it gives up, the playing board is put back and
+        get_stats().gave_up says why.
+        :param engine: solver engine to use, one of ENGINES, defaults to the
+        engine the board was created with
+        :return: true on success false otherwise
+        """
+        with self._solving:
+            solved = self._set_solution(engine or self._engine)
+            self._solved = True
+        return solved
+
+    def _set_solution(self, engine: str) -> bool:
+        """
+        the unlocked part of set_solution
+        :param engine: solver engine to use, one of ENGINES
+        :return: true on success false otherwise
+        """
+        if self._cache is None:
+            return self._find_solution(engine)
+        start = time.perf_counter()
+        solution = self._cache.get(self._board)
+        if solution is not None:
+            self._solution = solution
+            self._stats = SolveStats(engine)
+            self._stats.solved = True
+            self._stats.add_phase(CACHE, time.perf_counter() - start)
+            return True
+        lookup = time.perf_counter() - start
+        solved = self._find_solution(engine)
+        start = time.perf_counter()
+        if solved:
+            self._cache.put(self._board, self._solution)
+        self._stats.add_phase(CACHE, lookup + time.perf_counter() - start)
+        return solved
+
+    def _find_solution(self, engine: str) -> bool:
+        """
+        solve the board with an engine and store the solution, see
+        set_solution
+        :param engine: solver engine to use, one of ENGINES
         :return: true on success false otherwise
         """
-        if self.solve():
+        if engine == DLX:
+            links = DancingLinks(self._board, self._hook, self._limits)
+            solutions = links.search(1)
+            self._stats = links.stats
+            if solutions:
+                self._solution = solutions[0]
+                return True
+            return False
+        if engine != BACKTRACK:
+            raise ValueError("unknown solver engine: {}".format(engine))
+        self._stats = SolveStats(engine)
+        counts = dict(self._propagator.counts)
+        self._stats.solved = self.solve()
+        self._stats.techniques = {
+            technique: self._propagator.counts[technique] - counts[technique]
+            for technique in self._propagator.techniques}
+        if self._stats.solved:
+            self._solution = []
             for row in self._board:
                 self._solution.append(row.copy())
             self.reset()
             return True
         return False
 
+    def count_solutions(self, limit: int = 2,
+                        stats: SolveStats = None) -> int:
+        """
+        Count the solutions of the original board with the dancing links
+        engine, stopping as soon as limit solutions are found or the board's
+        limits run out
+        :param limit: stop counting after this many solutions
+        :param stats: if given, the work done is added to it, and if the
+        limits ran out stats.gave_up says why, the count is then only a
+        lower bound
+        :return: number of solutions found, at most limit
+        """
+        return count_solutions(self._original_board, limit, self._limits,
+                               stats)
+
+    def is_unique(self, stats: SolveStats = None) -> bool:
+        """
+        Check that the original board has exactly one solution, this costs
+        about as much as finding two solutions
+        :param stats: if given, the work done is added to it, and if the
+        board's limits ran out stats.gave_up says why
+        :return: true if the solution is unique, false otherwise, also
+        false if the limits ran out before it was known
+        """
+        counting = stats if stats is not None else SolveStats(DLX)
+        return self.count_solutions(2, counting) == 1 and \
+            not counting.gave_up
+
     def solve(self) -> bool:
         """
-        Recursively solve the board by backtracking. This is only used for
-        setting the solution upon initialization
+        Solve the board by backtracking, applying the logical techniques
+        before every guess. The guesses are kept on a stack instead of
+        recursing, and every filled cell goes on a trail, so taking back a
+        guess only clears the cells filled since it was made. Every fill is
+        checked against the masks, so once the board is full it is solved.
+        This is only used for setting the solution upon initialization. The
+        work done is added to the board's stats, and if the board's limits
+        run out the cells filled so far are taken back and stats.gave_up
+        says why.
         :return: true of solved, false otherwise
         """
-        # backtrack from the empty slot and try every number
-        candidates = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-        # we have an empty slot
-        pos = self.find_empty()
-        if pos[0] == -1:
-            if self.check_win():
-                return True
+        stats = self._stats
+        propagating = stats.phases.get(PROPAGATE, 0.0)
+        start = time.perf_counter()
+        trail = []
+        with self.searching():
+            try:
+                solved = self._search(trail)
+            except GaveUp as error:
+                self._undo(trail, 0)
+                stats.gave_up = error.reason
+                solved = False
+        propagating = stats.phases.get(PROPAGATE, 0.0) - propagating
+        searching = time.perf_counter() - start - propagating
+        stats.add_phase(SEARCH, searching)
+        if self._hook is not None:
+            self._hook.phase(PROPAGATE, propagating)
+            self._hook.phase(SEARCH, searching)
+        return solved
+
+    def _search(self, trail: List[Tuple[int, int]]) -> bool:
+        """
+        the search loop of solve
+        :param trail: list to record the filled cells in, so solve can take
+        them back if the search gives up
+        :return: true of solved, false otherwise
+        """
+        if not self._build_masks():
+            return False
+        stats = self._stats
+        hook = self._hook
+        limits = self._limits
+        # each guess is [row, col, numbers left to try, trail length before]
+        stack = []
+        stats.nodes += 1
+        if hook is not None:
+            hook.node(0)
+        if limits is not None:
+            limits.check(stats.nodes)
+        # fill in everything that can be deduced before guessing
+        consistent = self._propagate(trail)
+        while True:
+            if consistent:
+                row, col = self.select_cell()
+                if row == -1:
+                    return True
+                stack.append([row, col, self._free(row, col), len(trail)])
+            elif stack:
+                # the number tried in the last guess led to a contradiction
+                stats.backtracks += 1
+                if hook is not None:
+                    hook.backtrack(len(stack))
+            # take back guesses until one has a number left to try
+            while stack:
+                guess = stack[-1]
+                self._undo(trail, guess[3])
+                if guess[2]:
+                    break
+                stack.pop()
+                if stack:
+                    # it ran out of numbers, so the guess before it was wrong
+                    stats.backtracks += 1
+                    if hook is not None:
+                        hook.backtrack(len(stack))
             else:
+                self._undo(trail, 0)
                 return False
-        else:
-            for item in candidates:
-                if self.fill(pos[0], pos[1], item):
-                    if self.solve():
-                        return True
-                    self.clear(pos[0], pos[1])
-            return False
+            bit = guess[2] & -guess[2]
+            guess[2] ^= bit
+            self._place(guess[0], guess[1], bit.bit_length())
+            trail.append((guess[0], guess[1]))
+            stats.nodes += 1
+            if len(stack) > stats.max_depth:
+                stats.max_depth = len(stack)
+            if hook is not None:
+                hook.node(len(stack))
+            if limits is not None:
+                limits.check(stats.nodes)
+            consistent = self._propagate(trail)
+
+    def _propagate(self, trail: List[Tuple[int, int]]) -> bool:
+        """
+        apply the logical techniques, timing them as the PROPAGATE phase
+        :param trail: list to record the filled cells in
+        :return: false if the board was found to have no solution
+        """
+        start = time.perf_counter()
+        consistent = self._propagator.run(trail)
+        self._stats.add_phase(PROPAGATE, time.perf_counter() - start)
+        return consistent
+
+    def _undo(self, trail: List[Tuple[int, int]], mark: int) -> None:
+        """
+        clear the cells on the trail, most recent first, until it is back to
+        the given length
+        :param trail: filled cells in the order they were filled
+        :param mark: length to cut the trail back to
+        :return: None
+        """
+        while len(trail) > mark:
+            row, col = trail.pop()
+            self.clear(row, col)
 
     def reset(self) -> None:
         """
@@ -253,21 +971,25 @@ class Board:
         setting solution when initializing.
         :return: None
         """
-        self._board = self._original_board.copy()
-        for row in self._squares:
-            for item in row:
-                item.reset()
+        # copy into the rows in place, so playing on the board can not change
+        # the original and the squares keep looking at the board
+        for row, original in zip(self._board, self._original_board):
+            row[:] = original
+        self._build_masks()
+        if self._auto_notes:
+            self._fill_auto_notes()
         return
 
     @staticmethod
     def _dissect(board: List[List[int]]) -> List[List[List[int]]]:
         """
-        Dissect a board given in list of list of int format into the 9 large
+        Dissect a board given in list of list of int format into its large
         squares, and return them in list of list of int format.
         :param board: playing board
-        :return: 9 squares
+        :return: the squares, row major from the top left square
         """
-        index = [(0, 3), (3, 6), (6, 9)]
+        box = isqrt(len(board))
+        index = [(i * box, i * box + box) for i in range(box)]
         squares = []
         for rows in index:
             row = board[rows[0]:rows[1]]
@@ -285,16 +1007,18 @@ class Board:
         :param board: board to be printed
         :return: None
         """
-        for i in range(9):
-            if i % 3 == 0:
-                print("---------------------------")
-            for j in range(9):
-                if j % 3 == 0:
+        size = len(board)
+        box = isqrt(size)
+        for i in range(size):
+            if i % box == 0:
+                print("-" * (size * 2 + box * 3))
+            for j in range(size):
+                if j % box == 0:
                     print(" | ", end="")
-                if j == 8:
-                    print(board[i][j], end="\n")
+                if j == size - 1:
+                    print(DIGITS[board[i][j]], end="\n")
                 else:
-                    print(str(board[i][j]) + " ", end="")
+                    print(DIGITS[board[i][j]] + " ", end="")
 
     @staticmethod
     def validate_list(lst: List[int]) -> bool:
@@ -303,10 +1027,56 @@ class Board:
         :param lst: a row or a column
         :return: true if legal false otherwise
         """
-        num = []
+        seen = set()
         for item in lst:
-            if item != 0 and item in num:
-                return False
-            else:
-                num.append(item)
+            if item != 0:
+                if item in seen:
+                    return False
+                seen.add(item)
         return True
+
+
+def first_empty(board: Board) -> Tuple[int, int]:
+    """
+    Cell selection strategy that takes the first empty cell in row major
+    order, this is the original order the solver used
+    :param board: board to pick a cell from
+    :return: position of that cell, (-1, -1) if the board is full
+    """
+    return board.find_empty()
+
+
+def fewest_candidates(board: Board) -> Tuple[int, int]:
+    """
+    Cell selection strategy that takes the empty cell with the fewest legal
+    numbers left (minimum remaining values). Ties go to the cell with the
+    most empty peers, since filling it constrains the most other cells.
+    :param board: board to pick a cell from
+    :return: position of that cell, (-1, -1) if the board is full
+    """
+    grid = board.get_board()
+    size = board.get_size()
+    peers = board._layout.peer_pairs
+    best = (-1, -1)
+    best_count = size + 1
+    best_degree = -1
+    for row in range(size):
+        for col in range(size):
+            if grid[row][col] != 0:
+                continue
+            free = board._free(row, col)
+            count = BIT_COUNT[free] if free < 512 else bin(free).count("1")
+            if count > best_count:
+                continue
+            # a dead end or a forced move can not be beaten
+            if count <= 1:
+                return row, col
+            degree = 0
+            for r, c in peers[row][col]:
+                if grid[r][c] == 0:
+                    degree += 1
+            if count < best_count or degree > best_degree:
+                best = (row, col)
+                best_count = count
+                best_degree = degree
+    return best
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from canon import *
+from puzzle_io import parse, to_line
+"""
+A cache of solutions keyed by the canonical form of the puzzle, so a puzzle
+seen before, or a renamed, transposed or reordered copy of one, is not
+solved again.
+"""
+
+
+class SolutionCache:
+    """
+    Least recently used cache from canonical puzzles to their solutions,
+    both stored as one line of characters. It can be saved to a text file
+    of tab separated puzzle and solution lines, oldest first, and loaded
+    back. One cache can be shared by boards solving in the background, the
+    solutions are only touched with the lock held, but the board is
+    canonicalized outside it so lookups do not wait on each other for that.
+
+    ---Attributes---
+    capacity: most puzzles kept, the least recently used go first
+    path: file the cache is loaded from and saved to, None to keep it in
+    memory only
+    hits: lookups that found a solution
+    misses: lookups that did not
+    _solutions: canonical puzzle to canonical solution, least recently used
+    first
+    _last: the last board canonicalized as (line, canonical line,
+    transform), so storing a solution right after a miss does not
+    canonicalize the board again
+    _lock: held while the solutions or the counts are read or changed
+    """
+    capacity: int
+    path: Optional[str]
+    hits: int
+    misses: int
+    _solutions: OrderedDict
+    _last: Optional[Tuple[str, str, Transform]]
+    _lock: threading.Lock
+
+    def __init__(self, capacity: int = 100000, path: str = None):
+        """
+        Make a cache, loading the file at path if there is one
+        :param capacity: most puzzles kept
+        :param path: file to load from and save to
+        """
+        self.capacity = capacity
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._solutions = OrderedDict()
+        self._last = None
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._solutions)
+
+    def _canonical(self, board: List[List[int]]) -> Tuple[str, Transform]:
+        """
+        canonicalize a board, reusing the last result for the same board
+        :param board: the puzzle
+        :return: the canonical form as a line and the transform giving it
+        """
+        line = to_line(board)
+        # read once, another thread may replace it while this one uses it
+        last = self._last
+        if last is None or last[0] != line:
+            form, transform = canonical(board)
+            last = (line, to_line(form), transform)
+            self._last = last
+        return last[1], last[2]
+
+    def get(self, board: List[List[int]]) -> Optional[List[List[int]]]:
+        """
+        look up the solution of a puzzle
+        :param board: the puzzle, with 0 for empty cells
+        :return: its solution, mapped back from the canonical form, or None
+        if it is not cached
+        """
+        key, transform = self._canonical(board)
+        with self._lock:
+            solution = self._solutions.get(key)
+            if solution is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._solutions.move_to_end(key)
+        return transform.invert(parse(solution))
+
+    def put(self, board: List[List[int]],
+            solution: List[List[int]]) -> None:
+        """
+        store the solution of a puzzle under its canonical form
+        :param board: the puzzle, with 0 for empty cells
+        :param solution: its solution
+        :return: None
+        """
+        key, transform = self._canonical(board)
+        self._store(key, to_line(transform.apply(solution)))
+
+    def _store(self, key: str, solution: str) -> None:
+        """
+        store a canonical solution, dropping the least recently used ones
+        once there are more than capacity
+        :param key: the canonical puzzle
+        :param solution: its canonical solution
+        :return: None
+        """
+        with self._lock:
+            self._solutions[key] = solution
+            self._solutions.move_to_end(key)
+            while len(self._solutions) > self.capacity:
+                self._solutions.popitem(last=False)
+
+    def load(self, path: str) -> int:
+        """
+        add the puzzles in a saved cache file
+        :param path: file to read
+        :return: number of puzzles read
+        """
+        count = 0
+        with open(path) as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) >= 2 and not fields[0].startswith("#"):
+                    self._store(fields[0], fields[1])
+                    count += 1
+        return count
+
+    def save(self, path: str = None) -> None:
+        """
+        write the cache to a file, replacing it only once the new one is
+        complete
+        :param path: file to write, defaults to the cache's path
+        :return: None
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("no file to save the cache to")
+        temp = path + ".tmp"
+        with self._lock:
+            lines = list(self._solutions.items())
+        with open(temp, "w") as file:
+            for key, solution in lines:
+                file.write("{}\t{}\n".format(key, solution))
+        os.replace(temp, path)
+
+    def __enter__(self) -> SolutionCache:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.path:
+            self.save()
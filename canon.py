@@ -0,0 +1,274 @@
+from __future__ import annotations
+from itertools import permutations, product
+from typing import Dict, List, Optional, Tuple
+"""
+Canonical forms of puzzles under the symmetries of sudoku: renaming the
+numbers, transposing, reordering the rows within a band of three rows,
+reordering the bands, and the same for columns and stacks. Puzzles that
+are the same up to these symmetries have the same canonical form, so they
+only have to be solved once.
+
+The canonical form is the smallest board in the puzzle's orbit, read row
+by row with empty cells as 0, after renaming the numbers 1, 2, 3, ... in
+the order they first appear. Only 9x9 boards are canonicalized, bigger
+ones are their own canonical form.
+"""
+
+# every order of three things
+ORDERS = list(permutations(range(3)))
+
+# weeding out candidates that lead to the same boards costs more than it
+# saves unless there are at least this many
+DISTINCT_FROM = 4096
+
+# for every 9-bit mask of filled cells in a row, the smallest pattern of
+# filled cells a column order can give it and every column order that does
+_BEST_ORDERS: Dict[int, Tuple[Tuple[int, ...], List[Tuple[int, ...]]]] = {}
+
+
+class Transform:
+    """
+    A symmetry of sudoku: transpose the board or not, then reorder its rows
+    and columns, then rename its numbers.
+
+    ---Attributes---
+    transpose: whether the board is transposed first
+    rows: for every row of the result, the row it is taken from
+    cols: for every column of the result, the column it is taken from
+    numbers: the new name of every number, numbers[0] is 0
+    """
+    transpose: bool
+    rows: List[int]
+    cols: List[int]
+    numbers: List[int]
+
+    def __init__(self, transpose: bool, rows: List[int], cols: List[int],
+                 numbers: List[int]):
+        self.transpose = transpose
+        self.rows = rows
+        self.cols = cols
+        self.numbers = numbers
+
+    @staticmethod
+    def identity(size: int = 9) -> Transform:
+        """
+        the transform that leaves a board alone
+        :param size: side of the board
+        :return: the transform
+        """
+        return Transform(False, list(range(size)), list(range(size)),
+                         list(range(size + 1)))
+
+    def apply(self, board: List[List[int]]) -> List[List[int]]:
+        """
+        transform a board
+        :param board: the board
+        :return: a new, transformed board
+        """
+        if self.transpose:
+            board = [list(col) for col in zip(*board)]
+        numbers = self.numbers
+        return [[numbers[board[row][col]] for col in self.cols]
+                for row in self.rows]
+
+    def invert(self, board: List[List[int]]) -> List[List[int]]:
+        """
+        undo the transform on a board, e.g. to map the solution of a
+        canonical form back to the puzzle it came from
+        :param board: a transformed board
+        :return: a new board, as it was before the transform
+        """
+        size = len(board)
+        names = [0] * (size + 1)
+        for number, name in enumerate(self.numbers):
+            names[name] = number
+        result = [[0] * size for i in range(size)]
+        for i, row in enumerate(self.rows):
+            for j, col in enumerate(self.cols):
+                result[row][col] = names[board[i][j]]
+        if self.transpose:
+            result = [list(col) for col in zip(*result)]
+        return result
+
+
+def canonical(board: List[List[int]]) -> Tuple[List[List[int]], Transform]:
+    """
+    Find the canonical form of a puzzle. The rows are chosen one at a time,
+    keeping only the partial boards whose rows so far are the smallest, so
+    the column order only has to be searched for the first row.
+    :param board: the puzzle, with 0 for empty cells
+    :return: the canonical form and the transform that gives it
+    """
+    size = len(board)
+    if size != 9:
+        return [row.copy() for row in board], Transform.identity(size)
+    grids = (board, [list(col) for col in zip(*board)])
+
+    # each candidate is (transposed, rows so far, column order, names)
+    best = None
+    candidates = []
+    for transposed in (0, 1):
+        for row in range(9):
+            values = grids[transposed][row]
+            mask = 0
+            for col in range(9):
+                if values[col]:
+                    mask |= 1 << col
+            pattern, orders = _best_orders(mask)
+            if best is None or pattern < best:
+                best = pattern
+                candidates = []
+            if pattern == best:
+                for order in orders:
+                    names = {}
+                    for col in order:
+                        if values[col]:
+                            names[values[col]] = len(names) + 1
+                    candidates.append((transposed, (row,), order, names))
+    candidates = _distinct(candidates, grids)
+
+    for position in range(1, 9):
+        best = None
+        chosen = []
+        for transposed, rows, order, names in candidates:
+            for row in _next_rows(rows, position):
+                line, new = _rename(grids[transposed][row], order, names,
+                                    best)
+                if line is None:
+                    continue
+                if best is None or line < best:
+                    best = line
+                    chosen = []
+                if line == best:
+                    chosen.append((transposed, rows + (row,), order, new))
+        candidates = _distinct(chosen, grids)
+
+    # any candidate left gives the same board, the rest are automorphisms
+    transposed, rows, order, names = candidates[0]
+    numbers = [0] * 10
+    for number, name in names.items():
+        numbers[number] = name
+    # numbers missing from the puzzle take the names left, in order
+    unused = iter(sorted(set(range(1, 10)) - set(names.values())))
+    for number in range(1, 10):
+        if not numbers[number]:
+            numbers[number] = next(unused)
+    transform = Transform(bool(transposed), list(rows), list(order), numbers)
+    return transform.apply(board), transform
+
+
+def _best_orders(mask: int) -> Tuple[Tuple[int, ...], List[Tuple[int, ...]]]:
+    """
+    the smallest pattern of filled cells a column order can give a row, and
+    every column order that gives it, worked out once per mask. The
+    smallest pattern puts the stacks with the fewest filled cells first
+    and the empty cells first within each stack, so the orders that give
+    it are the ones that do that.
+    :param mask: bit i is set if column i of the row is filled
+    :return: the pattern, 1 for filled cells, and the column orders
+    """
+    if mask not in _BEST_ORDERS:
+        filled = [[col for col in range(stack * 3, stack * 3 + 3)
+                   if mask >> col & 1] for stack in range(3)]
+        counts = sorted(len(cols) for cols in filled)
+        pattern = tuple(cell for count in counts
+                        for cell in (0,) * (3 - count) + (1,) * count)
+        # the ways to order each stack: its empty cells, then its filled
+        inner = []
+        for stack in range(3):
+            empty = [col for col in range(stack * 3, stack * 3 + 3)
+                     if col not in filled[stack]]
+            inner.append([first + last
+                          for first in permutations(empty)
+                          for last in permutations(filled[stack])])
+        orders = [sum(ways, ())
+                  for stacks in ORDERS
+                  if [len(filled[stack]) for stack in stacks] == counts
+                  for ways in product(*(inner[stack] for stack in stacks))]
+        _BEST_ORDERS[mask] = (pattern, orders)
+    return _BEST_ORDERS[mask]
+
+
+def _next_rows(rows: Tuple[int, ...], position: int) -> List[int]:
+    """
+    the rows that can come next, keeping the bands together
+    :param rows: rows chosen so far
+    :param position: row of the result being chosen
+    :return: the rows
+    """
+    if position % 3 == 0:
+        used = {row // 3 for row in rows}
+        return [band * 3 + i for band in range(3) if band not in used
+                for i in range(3)]
+    band = rows[-1] // 3
+    return [band * 3 + i for i in range(3) if band * 3 + i not in rows]
+
+
+def _distinct(candidates: List[tuple],
+              grids: Tuple[List[List[int]], ...]) -> List[tuple]:
+    """
+    drop candidates that can only lead to the same boards as one kept
+    before them, which happens when the rows left look the same through
+    their column order and names, e.g. on boards with empty rows
+    :param candidates: (transposed, rows so far, column order, names)
+    :param grids: the board and its transpose
+    :return: the candidates kept
+    """
+    if len(candidates) < DISTINCT_FROM:
+        return candidates
+    kept = []
+    seen = set()
+    for candidate in candidates:
+        transposed, rows, order, names = candidate
+        grid = grids[transposed]
+
+        def look(row: int) -> Tuple[int, ...]:
+            # numbers not named yet keep their own value, offset past names
+            return tuple(names.get(grid[row][col], grid[row][col] + 10)
+                         if grid[row][col] else 0 for col in order)
+
+        band = rows[-1] // 3
+        left = tuple(sorted(look(row) for row in range(band * 3, band * 3 + 3)
+                            if row not in rows))
+        used = {row // 3 for row in rows}
+        bands = tuple(sorted(tuple(sorted(look(b * 3 + i) for i in range(3)))
+                             for b in range(3) if b not in used))
+        key = (left, bands)
+        if key not in seen:
+            seen.add(key)
+            kept.append(candidate)
+    return kept
+
+
+def _rename(values: List[int], order: Tuple[int, ...], names: Dict[int, int],
+            best: Optional[Tuple[int, ...]]) -> Tuple[Optional[tuple], dict]:
+    """
+    reorder a row and rename its numbers, naming new numbers in the order
+    they appear, giving up as soon as it is bigger than the best row so far
+    :param values: the row
+    :param order: the column order
+    :param names: names given so far, left alone
+    :param best: the smallest row so far, None if there is none
+    :return: the renamed row and the names including the new ones, or None
+    and the names given if the row is bigger than best
+    """
+    line = []
+    new = names
+    smaller = best is None
+    for col in order:
+        number = values[col]
+        if number:
+            name = new.get(number)
+            if name is None:
+                if new is names:
+                    new = dict(names)
+                name = new[number] = len(new) + 1
+        else:
+            name = 0
+        if not smaller:
+            bound = best[len(line)]
+            if name > bound:
+                return None, names
+            smaller = name < bound
+        line.append(name)
+    return tuple(line), new
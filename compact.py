@@ -0,0 +1,148 @@
+from __future__ import annotations
+from typing import Iterator
+from square import *
+from puzzle_io import parse, read_puzzles
+"""
+A compact board for batch work, 81 bytes per board. Keep many puzzles as
+grids, e.g. with read_grids, and unpack one with rows() to solve it.
+"""
+
+
+class Grid:
+    """
+    A board packed into one 81 byte buffer, one byte per cell in row major
+    order with 0 for empty cells. Snapshots share the buffer until one of
+    them is written to, so taking one is O(1).
+
+    ---Attributes---
+    _cells: the buffer
+    _shared: whether the buffer may be shared with a snapshot, in which case
+    it is copied before the next write
+    """
+    __slots__ = ("_cells", "_shared")
+
+    _cells: bytearray
+    _shared: bool
+
+    def __init__(self, board: List[List[int]] = None):
+        """
+        Initialize a grid
+        :param board: numbers for the board, 9 rows of 9, an empty board if
+        left out
+        """
+        if board is None:
+            self._cells = bytearray(81)
+        else:
+            self._cells = bytearray(number for row in board
+                                    for number in row)
+            if len(board) != 9 or any(len(row) != 9 for row in board):
+                raise ValueError("a grid needs 9 rows of 9 cells, got {} "
+                                 "cells".format(len(self._cells)))
+        self._shared = False
+
+    @staticmethod
+    def from_bytes(cells: bytes) -> Grid:
+        """
+        Make a grid from 81 bytes, one per cell
+        :param cells: the bytes
+        :return: the grid
+        """
+        if len(cells) != 81:
+            raise ValueError("a grid needs 81 cells, got {}".format(
+                len(cells)))
+        grid = Grid()
+        grid._cells = bytearray(cells)
+        return grid
+
+    @staticmethod
+    def from_line(line: str) -> Grid:
+        """
+        Make a grid from a puzzle written on one line, see parse
+        :param line: the puzzle, 81 characters
+        :return: the grid
+        """
+        return Grid(parse(line))
+
+    def get(self, row: int, col: int) -> int:
+        """
+        return the number at the given cell
+        :param row: row of cell
+        :param col: col of cell
+        :return: number at that cell
+        """
+        return self._cells[row * 9 + col]
+
+    def set(self, row: int, col: int, number: int) -> None:
+        """
+        write a number into the given cell, without checking the rules,
+        copying the buffer first if a snapshot shares it
+        :param row: row of cell
+        :param col: col of cell
+        :param number: number to write, 0 to clear the cell
+        :return: None
+        """
+        if self._shared:
+            self._cells = bytearray(self._cells)
+            self._shared = False
+        self._cells[row * 9 + col] = number
+
+    def snapshot(self) -> Grid:
+        """
+        return a copy of this grid that shares its buffer until either of
+        them is written to
+        :return: the copy
+        """
+        grid = Grid.__new__(Grid)
+        grid._cells = self._cells
+        grid._shared = True
+        self._shared = True
+        return grid
+
+    def square(self, row: int, col: int) -> Square:
+        """
+        return a view on one of the 9 squares of this grid, writing to it
+        writes to the grid, copying a buffer shared with a snapshot first
+        :param row: row of the square, 0 to 2
+        :param col: column of the square, 0 to 2
+        :return: the square
+        """
+        return Square(self, row * 3, col * 3)
+
+    def rows(self) -> List[List[int]]:
+        """
+        return the board in list of list of int format
+        :return: the board
+        """
+        return [list(self._cells[row * 9:row * 9 + 9]) for row in range(9)]
+
+    def to_bytes(self) -> bytes:
+        """
+        return the cells as 81 immutable bytes, usable as a dictionary key
+        :return: the bytes
+        """
+        return bytes(self._cells)
+
+    def __getitem__(self, row: int) -> bytes:
+        """
+        return one row of the grid, read only
+        :param row: the row
+        :return: the 9 numbers of that row
+        """
+        return bytes(self._cells[row * 9:row * 9 + 9])
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Grid):
+            return NotImplemented
+        return self._cells == other._cells
+
+    __hash__ = None
+
+
+def read_grids(path: str) -> Iterator[Grid]:
+    """
+    Stream the puzzles in a text or binary file as grids, see read_puzzles
+    :param path: file to read, - for standard input (text only)
+    :return: the grids
+    """
+    for line in read_puzzles(path):
+        yield Grid.from_line(line)
@@ -0,0 +1,364 @@
+from __future__ import annotations
+import time
+from math import isqrt
+from typing import List, Optional
+from stats import *
+"""
+Sudoku as an exact cover problem, solved with Knuth's Algorithm X on a
+dancing links structure.
+
+Every candidate (row, col, number) is one of 729 rows of the cover matrix,
+and it covers 4 of the 324 constraints: its cell is filled, and its number
+appears once in its row, its column and its square. A size x size board
+has size ** 3 rows and 4 * size ** 2 constraints.
+"""
+
+
+class DancingLinks:
+    """
+    The exact cover matrix for one puzzle, stored as circular doubly linked
+    lists in flat arrays. Node 0 is the root, nodes 1 to 324 are the column
+    headers and every node after that is a 1 in the matrix.
+
+    ---Attributes---
+    nodes: number of search nodes visited in the last search
+    stats: the work done building the matrix and in the last search
+    hook: receives the search's events, None for no hook
+    limits: when to give up on a search, None to search until done
+    _left: left neighbour of every node
+    _right: right neighbour of every node
+    _up: up neighbour of every node
+    _down: down neighbour of every node
+    _column: column header of every node
+    _size: side of the board
+    _candidate: the candidate row each node belongs to,
+    (row * size + col) * size + number - 1
+    _count: number of nodes left in every column
+    _chosen: candidates chosen so far, including the givens
+    _consistent: false if the givens already break a constraint
+    _found: number of solutions found in the last search
+    """
+    nodes: int
+    stats: SolveStats
+    hook: Optional[SolverHook]
+    limits: Optional[Limits]
+    _left: List[int]
+    _right: List[int]
+    _up: List[int]
+    _down: List[int]
+    _column: List[int]
+    _size: int
+    _candidate: List[int]
+    _count: List[int]
+    _chosen: List[int]
+    _consistent: bool
+    _found: int
+
+    def __init__(self, board: List[List[int]], hook: SolverHook = None,
+                 limits: Limits = None):
+        """
+        Build the cover matrix for a board and select its givens
+        :param board: the puzzle, with 0 for empty cells
+        :param hook: receives events while searching
+        :param limits: when to give up on a search
+        """
+        start = time.perf_counter()
+        size = len(board)
+        box = isqrt(size)
+        cells = size * size
+        headers = 4 * cells
+        self.nodes = 0
+        self.stats = SolveStats("dlx")
+        self.hook = hook
+        self.limits = limits
+        self._size = size
+        self._left = list(range(-1, headers))
+        self._left[0] = headers
+        self._right = list(range(1, headers + 2))
+        self._right[headers] = 0
+        self._up = list(range(headers + 1))
+        self._down = list(range(headers + 1))
+        self._column = list(range(headers + 1))
+        self._candidate = [-1] * (headers + 1)
+        self._count = [0] * (headers + 1)
+        self._chosen = []
+        self._consistent = True
+        self._found = 0
+
+        first = {}
+        for row in range(size):
+            for col in range(size):
+                sqr = row // box * box + col // box
+                for number in range(size):
+                    columns = [1 + row * size + col,
+                               1 + cells + row * size + number,
+                               1 + 2 * cells + col * size + number,
+                               1 + 3 * cells + sqr * size + number]
+                    candidate = (row * size + col) * size + number
+                    first[candidate] = self._add_row(candidate, columns)
+
+        for row in range(size):
+            for col in range(size):
+                if board[row][col]:
+                    candidate = (row * size + col) * size + board[row][col] - 1
+                    node = first[candidate]
+                    if not self._select(node):
+                        self._consistent = False
+                        break
+            if not self._consistent:
+                break
+        self.stats.add_phase(BUILD, time.perf_counter() - start)
+        if hook is not None:
+            hook.phase(BUILD, self.stats.phases[BUILD])
+
+    def _add_row(self, candidate: int, columns: List[int]) -> int:
+        """
+        append a row of the matrix with a 1 in each of the given columns
+        :param candidate: the candidate this row stands for
+        :param columns: column headers of the 1s in this row
+        :return: the first node of the row
+        """
+        start = len(self._column)
+        for i, col in enumerate(columns):
+            node = start + i
+            self._left.append(start + (i - 1) % len(columns))
+            self._right.append(start + (i + 1) % len(columns))
+            self._up.append(self._up[col])
+            self._down.append(col)
+            self._down[self._up[col]] = node
+            self._up[col] = node
+            self._column.append(col)
+            self._candidate.append(candidate)
+            self._count[col] += 1
+        return start
+
+    def _select(self, node: int) -> bool:
+        """
+        choose the row of a given, covering all of its columns
+        :param node: first node of the row
+        :return: false if one of its columns is already covered
+        """
+        j = node
+        while True:
+            col = self._column[j]
+            if self._left[self._right[col]] != col:
+                return False
+            j = self._right[j]
+            if j == node:
+                break
+        j = node
+        while True:
+            self._cover(self._column[j])
+            j = self._right[j]
+            if j == node:
+                break
+        self._chosen.append(self._candidate[node])
+        return True
+
+    def _cover(self, col: int) -> None:
+        """
+        remove a column from the header list and every row using it from
+        the other columns
+        :param col: column header
+        :return: None
+        """
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, count = self._column, self._count
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                count[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def _uncover(self, col: int) -> None:
+        """
+        undo _cover, in exactly the reverse order
+        :param col: column header
+        :return: None
+        """
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, count = self._column, self._count
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                count[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    def search(self, limit: int = 1) -> List[List[List[int]]]:
+        """
+        Find solutions of the puzzle with Algorithm X, always branching on
+        the constraint with the fewest candidates left. If the limits run
+        out first, the solutions found so far are returned and stats.gave_up
+        says why, the matrix is left as it was so it can be searched again.
+        :param limit: stop after this many solutions
+        :return: up to limit solved boards
+        """
+        solutions = []
+        self._run(solutions, limit)
+        return solutions
+
+    def count(self, limit: int = 2) -> int:
+        """
+        Count the solutions of the puzzle like search, without building a
+        board for each one, so a large limit costs time but not memory
+        :param limit: stop after this many solutions
+        :return: number of solutions found, at most limit
+        """
+        self._run(None, limit)
+        return self._found
+
+    def _run(self, solutions: Optional[List[List[List[int]]]],
+             limit: int) -> None:
+        """
+        run a search, keeping its stats
+        :param solutions: list to add solved boards to, None to only count
+        them
+        :param limit: stop after this many solutions
+        :return: None
+        """
+        start = time.perf_counter()
+        build = self.stats.phases.get(BUILD, 0.0)
+        self.stats = SolveStats("dlx")
+        self.stats.add_phase(BUILD, build)
+        self.nodes = 0
+        self._found = 0
+        if self._consistent and limit > 0:
+            try:
+                self._search(solutions, limit, 0)
+            except GaveUp as error:
+                self.stats.gave_up = error.reason
+        self.stats.nodes = self.nodes
+        self.stats.solved = self._found > 0
+        self.stats.add_phase(SEARCH, time.perf_counter() - start)
+        if self.hook is not None:
+            self.hook.phase(SEARCH, self.stats.phases[SEARCH])
+
+    def _search(self, solutions: Optional[List[List[List[int]]]],
+                limit: int, depth: int) -> bool:
+        """
+        recursive part of search
+        :param solutions: list to add solved boards to, None to only count
+        them
+        :param limit: stop after this many solutions
+        :param depth: rows chosen so far, not counting the givens
+        :return: true once limit solutions have been found
+        """
+        self.nodes += 1
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        if self.hook is not None:
+            self.hook.node(depth)
+        if self.limits is not None:
+            self.limits.check(self.nodes)
+        right, down = self._right, self._down
+        if right[0] == 0:
+            self._found += 1
+            if solutions is not None:
+                solutions.append(self._grid())
+            return self._found >= limit
+        # column with the fewest rows left
+        col = right[0]
+        best = self._count[col]
+        j = right[col]
+        while j != 0 and best > 1:
+            if self._count[j] < best:
+                col = j
+                best = self._count[j]
+            j = right[j]
+        if best == 0:
+            return False
+
+        self._cover(col)
+        i = down[col]
+        while i != col:
+            self._chosen.append(self._candidate[i])
+            j = right[i]
+            while j != i:
+                self._cover(self._column[j])
+                j = right[j]
+            try:
+                done = self._search(solutions, limit, depth + 1)
+            except GaveUp:
+                # put the matrix back together on the way out
+                self._unchoose(i)
+                self._uncover(col)
+                raise
+            if not done:
+                self.stats.backtracks += 1
+                if self.hook is not None:
+                    self.hook.backtrack(depth + 1)
+            self._unchoose(i)
+            if done:
+                self._uncover(col)
+                return True
+            i = down[i]
+        self._uncover(col)
+        return False
+
+    def _unchoose(self, i: int) -> None:
+        """
+        take back the row of a node, uncovering the columns it covered in
+        the opposite order
+        :param i: a node of the row, the one that was chosen through
+        :return: None
+        """
+        j = self._left[i]
+        while j != i:
+            self._uncover(self._column[j])
+            j = self._left[j]
+        self._chosen.pop()
+
+    def _grid(self) -> List[List[int]]:
+        """
+        turn the chosen candidates into a board
+        :return: the board
+        """
+        size = self._size
+        grid = [[0] * size for i in range(size)]
+        for candidate in self._chosen:
+            cell = candidate // size
+            grid[cell // size][cell % size] = candidate % size + 1
+        return grid
+
+
+def solve_grid(board: List[List[int]]) -> List[List[int]]:
+    """
+    Solve a board with dancing links
+    :param board: the puzzle, with 0 for empty cells
+    :return: the solved board, or an empty list if there is no solution
+    """
+    solutions = DancingLinks(board).search(1)
+    if solutions:
+        return solutions[0]
+    return []
+
+
+def count_solutions(board: List[List[int]], limit: int = 2,
+                    limits: Limits = None, stats: SolveStats = None) -> int:
+    """
+    Count the solutions of a board with dancing links, stopping at limit
+    :param board: the puzzle, with 0 for empty cells
+    :param limit: stop counting after this many solutions
+    :param limits: when to give up counting
+    :param stats: if given, the work done is added to it, and if the limits
+    ran out stats.gave_up says why, the count is then only a lower bound
+    :return: number of solutions found, at most limit
+    """
+    links = DancingLinks(board, limits=limits)
+    count = links.count(limit)
+    if stats is not None:
+        stats.merge(links.stats)
+        stats.gave_up = links.stats.gave_up or stats.gave_up
+    return count
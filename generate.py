@@ -0,0 +1,256 @@
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from multiprocessing import Pool
+from typing import Iterator
+from board import *
+"""
+Generating new puzzles with a unique solution, graded by how hard they are
+to solve.
+"""
+
+EASY = "easy"
+MEDIUM = "medium"
+HARD = "hard"
+EXPERT = "expert"
+DIFFICULTIES = (EASY, MEDIUM, HARD, EXPERT)
+
+# puzzles that need more search nodes than this are graded expert
+EXPERT_NODES = 50
+
+
+class Puzzle:
+    """
+    A generated puzzle.
+
+    ---Attributes---
+    board: the puzzle, with 0 for empty cells
+    solution: its unique solution
+    difficulty: one of DIFFICULTIES
+    nodes: search nodes the solver needed, 1 if logic alone solves it
+    """
+    board: List[List[int]]
+    solution: List[List[int]]
+    difficulty: str
+    nodes: int
+
+    def __init__(self, board: List[List[int]], solution: List[List[int]],
+                 difficulty: str, nodes: int):
+        self.board = board
+        self.solution = solution
+        self.difficulty = difficulty
+        self.nodes = nodes
+
+    def line(self) -> str:
+        """
+        the puzzle as a tab separated line of the puzzle, the solution, each
+        written as one line of characters, the difficulty and the search
+        nodes
+        :return: the line
+        """
+        return "{}\t{}\t{}\t{}".format(to_line(self.board),
+                                       to_line(self.solution),
+                                       self.difficulty, self.nodes)
+
+
+def full_grid(rng: random.Random, box: int = 3,
+              limits: Limits = None) -> List[List[int]]:
+    """
+    Make a random solved board. The squares on the diagonal do not share any
+    row or column, so they are filled with random permutations and the rest
+    is solved with dancing links.
+    :param rng: source of randomness
+    :param box: side of a square, 3 for a 9x9 board
+    :param limits: when to give up, raises GaveUp once they run out
+    :return: solved board
+    """
+    size = box * box
+    board = [[0] * size for i in range(size)]
+    for sqr in range(box):
+        numbers = list(range(1, size + 1))
+        rng.shuffle(numbers)
+        for i in range(size):
+            board[sqr * box + i // box][sqr * box + i % box] = numbers[i]
+    links = DancingLinks(board, limits=limits)
+    solutions = links.search(1)
+    if links.stats.gave_up:
+        raise GaveUp(links.stats.gave_up)
+    return solutions[0]
+
+
+def dig(solution: List[List[int]], rng: random.Random,
+        symmetric: bool = True, limits: Limits = None) -> List[List[int]]:
+    """
+    Remove clues from a solved board in random order, keeping each removal
+    only if the puzzle still has a unique solution
+    :param solution: solved board
+    :param rng: source of randomness
+    :param symmetric: remove clues in pairs that mirror each other through
+    the centre
+    :param limits: when to give up, the node budget is for each check of
+    uniqueness, raises GaveUp once they run out
+    :return: the puzzle, with 0 for empty cells
+    """
+    stats = SolveStats(DLX)
+    board = [row.copy() for row in solution]
+    size = len(solution)
+    cells = [(row, col) for row in range(size) for col in range(size)]
+    if symmetric:
+        cells = cells[:(size * size + 1) // 2]
+    rng.shuffle(cells)
+    for row, col in cells:
+        removed = [(row, col)]
+        mirror = (size - 1 - row, size - 1 - col)
+        if symmetric and mirror != (row, col):
+            removed.append(mirror)
+        for r, c in removed:
+            board[r][c] = 0
+        count = count_solutions(board, 2, limits, stats)
+        if stats.gave_up:
+            raise GaveUp(stats.gave_up)
+        if count != 1:
+            for r, c in removed:
+                board[r][c] = solution[r][c]
+    return board
+
+
+def grade(board: List[List[int]],
+          limits: Limits = None) -> Tuple[str, int]:
+    """
+    Grade a puzzle by the techniques it needs. Easy puzzles fall to singles,
+    medium ones need locked candidates or naked pairs, and the rest need
+    search, hard ones for a few guesses and expert ones for many.
+    :param board: the puzzle, with 0 for empty cells
+    :param limits: when to give up, raises GaveUp once they run out
+    :return: the difficulty and the search nodes needed with every technique
+    """
+    singles = Board(board, techniques=SINGLES, limits=limits)
+    if singles.gave_up():
+        raise GaveUp(singles.gave_up())
+    if singles.get_nodes() == 1:
+        return EASY, 1
+    full = Board(board, techniques=ALL_TECHNIQUES, limits=limits)
+    if full.gave_up():
+        raise GaveUp(full.gave_up())
+    nodes = full.get_nodes()
+    if nodes == 1:
+        return MEDIUM, nodes
+    if nodes <= EXPERT_NODES:
+        return HARD, nodes
+    return EXPERT, nodes
+
+
+def generate(rng: random.Random = None, symmetric: bool = True,
+             box: int = 3, limits: Limits = None) -> Puzzle:
+    """
+    Generate a graded puzzle with a unique solution
+    :param rng: source of randomness, a fresh one if left out
+    :param symmetric: keep the clues symmetric through the centre
+    :param box: side of a square, 3 for a 9x9 board
+    :param limits: when to give up, the deadline and token are for the
+    whole puzzle and the node budget for each search, raises GaveUp once
+    they run out
+    :return: the puzzle
+    """
+    rng = rng or random.Random()
+    solution = full_grid(rng, box, limits)
+    board = dig(solution, rng, symmetric, limits)
+    difficulty, nodes = grade(board, limits)
+    return Puzzle(board, solution, difficulty, nodes)
+
+
+def generate_many(count: int, workers: int = None, seed: int = None,
+                  symmetric: bool = True, box: int = 3) -> Iterator[Puzzle]:
+    """
+    Generate puzzles on a pool of worker processes. With a seed they come in
+    the order of their seeds, so a run can be repeated whatever the number
+    of workers, without one in the order they finish
+    :param count: number of puzzles
+    :param workers: number of processes, defaults to the number of cores,
+    1 generates in this process
+    :param seed: base seed, puzzle i uses seed + i so runs can be repeated
+    :param symmetric: keep the clues symmetric through the centre
+    :param box: side of a square, 3 for a 9x9 board
+    :return: the puzzles
+    """
+    ordered = seed is not None
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    jobs = ((seed + i, symmetric, box) for i in range(count))
+    if workers == 1:
+        for job in jobs:
+            yield _generate_job(job)
+        return
+    with Pool(workers) as pool:
+        run = pool.imap if ordered else pool.imap_unordered
+        for puzzle in run(_generate_job, jobs, 4):
+            yield puzzle
+
+
+def _generate_job(job: Tuple[int, bool, int]) -> Puzzle:
+    """
+    generate one puzzle, run in the worker processes
+    :param job: seed, whether to keep the clues symmetric and the side of a
+    square
+    :return: the puzzle
+    """
+    seed, symmetric, box = job
+    return generate(random.Random(seed), symmetric, box)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sudoku puzzles.")
+    parser.add_argument("-n", "--count", type=int, default=1,
+                        help="number of puzzles to generate")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write to, - for standard output")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, defaults to the core count")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="base seed, for repeatable runs")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default=None,
+                        help="only write puzzles of this difficulty")
+    parser.add_argument("--asymmetric", action="store_true",
+                        help="do not keep the clues symmetric")
+    parser.add_argument("--binary", action="store_true",
+                        help="write only the puzzles, as a binary puzzle "
+                             "file")
+    parser.add_argument("--box", type=int, default=3,
+                        help="side of a square, 4 for 16x16 boards")
+    args = parser.parse_args()
+    if args.binary and args.output == "-":
+        parser.error("--binary needs --output")
+    if args.binary and args.box != 3:
+        parser.error("binary puzzle files only hold 9x9 boards")
+
+    if args.binary:
+        out = BinaryWriter(args.output)
+    elif args.output == "-":
+        out = sys.stdout
+    else:
+        out = open(args.output, "w")
+    written = 0
+    start = time.perf_counter()
+    try:
+        for puzzle in generate_many(args.count, args.workers, args.seed,
+                                    not args.asymmetric, args.box):
+            if args.difficulty and puzzle.difficulty != args.difficulty:
+                continue
+            if args.binary:
+                out.write(puzzle.board)
+            else:
+                print(puzzle.line(), file=out)
+            out.flush()
+            written += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print("generated {} puzzles in {:.2f}s, wrote {}".format(
+        args.count, elapsed, written), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,17 @@
 from __future__ import annotations
+import argparse
+import os
+import time
 import pygame
 from board import *
+from steps import *
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 LIGHT_GREEN = (100, 200, 100)
+BLUE = (70, 130, 230)
 
 # width and height of the window
 WINDOW_SIZE = (900, 1000)
@@ -15,6 +20,23 @@ WINDOW_SIZE = (900, 1000)
 WALL = 5
 WALL_THICK = 8
 
+# frames drawn per second at most
+FPS = 60
+
+# solve steps shown per frame while watching a solve
+STEPS_PER_FRAME = 2
+
+# seconds of each frame spent applying steps while fast forwarding, the
+# rest is left for drawing so the window keeps up
+FRAME_BUDGET = 0.008
+
+# frames per second of exported animations
+EXPORT_FPS = 30
+
+# seconds an export waits for the solver's next step before deciding it
+# is stuck
+EXPORT_WAIT = 5.0
+
 pygame.font.init()
 
 
@@ -33,6 +55,20 @@ class Game:
     strikes: the number of strikes the player has gotten
     solved: whether or not the board is solved, used to stop further actions
     on the board once it is solved
+    solver: the background solve being watched, None if there is none
+    paused: whether the solve being watched is paused
+    fast: whether the solve being watched is fast forwarded
+    steps_per_frame: solve steps shown per frame
+    step: the cell of the last solve step and the color to outline it in
+    hint: the last hint asked for, its cell is selected and the cells it
+    rests on outlined in blue until it is filled, None if there is none
+    fonts: fonts made so far, by size
+    glyphs: numbers rendered so far, by number, color and font size
+    shown: for every cell, the number, note and outline color last drawn,
+    None if the cell has to be drawn again, or None for the whole board
+    shown_time: the time last drawn
+    shown_strikes: the strikes last drawn
+    dirty: the areas drawn on since the screen was last updated
     """
     surface: pygame.Surface
     board: Board
@@ -42,22 +78,50 @@ class Game:
     cell_size: int
     strikes: int
     solved: bool
-
-    def __init__(self, board: List[List[int]], surface: pygame.Surface):
+    solver: Optional[StepSolver]
+    paused: bool
+    fast: bool
+    steps_per_frame: int
+    step: Optional[Tuple[Tuple[int, int], Tuple[int, int, int]]]
+    hint: Optional[Hint]
+    fonts: Dict[int, pygame.font.Font]
+    glyphs: Dict[Tuple[int, Tuple[int, int, int], int], pygame.Surface]
+    shown: Optional[List[list]]
+    shown_time: Optional[str]
+    shown_strikes: Optional[int]
+    dirty: List[pygame.Rect]
+
+    def __init__(self, board: List[List[int]], surface: pygame.Surface,
+                 steps_per_frame: int = STEPS_PER_FRAME):
         """
         Initialize a game instance.
         :param board: the board which we are playing with, given as a list of
         list of integers, with 0 representing empty cells.
         :param surface: the surface on which we will draw the grid and numbers
+        :param steps_per_frame: solve steps shown per frame when watching the
+        board get solved
         """
         self.surface = surface
-        self.board = Board(board)
+        # solve in the background so the window opens right away
+        self.board = Board(board, background=True)
         self.clock = pygame.time.Clock()
         self.time = 0
         self.selected = None
-        self.cell_size = WINDOW_SIZE[0] / 9
+        self.cell_size = WINDOW_SIZE[0] / self.board.get_size()
         self.strikes = 0
         self.solved = False
+        self.solver = None
+        self.paused = False
+        self.fast = False
+        self.steps_per_frame = steps_per_frame
+        self.step = None
+        self.hint = None
+        self.fonts = {}
+        self.glyphs = {}
+        self.shown = None
+        self.shown_time = None
+        self.shown_strikes = None
+        self.dirty = []
 
     def process_mbdown(self, pos: Tuple[int, int]) -> bool:
         """
@@ -70,19 +134,26 @@ class Game:
             x = int(pos[0] // self.cell_size)
             y = int(pos[1] // self.cell_size)
             self.selected = (x, y)
+            self.hint = None
             return True
         return False
 
     def fill_solution(self) -> bool:
         """
-        fill the notes at the selected position into the playing board.
+        fill the notes at the selected position into the playing board. A
+        strike is only given when a single note was checked and was wrong,
+        not when the cell has several notes, as it does with auto notes.
         :return: true upon success false otherwise
         """
         if self.selected:
-            if self.board.get(self.selected[1], self.selected[0]) == 0:
-                if self.board.fill_solution(self.selected[1], self.selected[0]):
+            row, col = self.selected[1], self.selected[0]
+            if self.board.get(row, col) == 0:
+                with self.board.get_history().move(row, col, "fill"):
+                    filled = self.board.fill_solution(row, col)
+                if filled:
                     return True
-                self.strikes += 1
+                if filled is False:
+                    self.strikes += 1
                 return False
             print("That's filled")
         return False
@@ -93,78 +164,220 @@ class Game:
         :return: None
         """
         if self.selected:
-            self.board.clear(self.selected[1], self.selected[0])
+            row, col = self.selected[1], self.selected[0]
+            with self.board.get_history().move(row, col, "clear"):
+                self.board.clear(row, col)
 
     def visual_solve(self) -> bool:
         """
-        Visualize the solving process, correct cells will be outlined in green,
-        false or currently visiting cells are outlined in red.
-        :return: true on success false otherwise
-        """
-        # backtrack from the empty slot and try every number
-        candidates = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-        # we have an empty slot
-        pos = self.board.find_empty()
-        if pos[0] == -1:
-            if self.board.check_win():
-                return True
-            else:
-                return False
-        else:
-            for item in candidates:
-                self.draw_outline((pos[1], pos[0]), RED)
-                pygame.display.update()
-                pygame.time.delay(10)
-                if self.board.fill(pos[0], pos[1], item):
-                    self.draw_outline((pos[1], pos[0]), GREEN)
-                    self.clean(pos[1], pos[0])
-                    self.draw_number(pos[1], pos[0], item)
-                    pygame.display.update()
-                    pygame.time.delay(10)
-                    if self.visual_solve():
-                        return True
-                    self.board.clear(pos[0], pos[1])
-                    self.clean(pos[1], pos[0])
+        Start watching the board get solved. The solve runs in a background
+        thread and every frame shows a few of its steps, correct cells are
+        outlined in green, false or currently visiting cells in red. The
+        whole solve is one move in the board's history, so it can be taken
+        back with undo, and cancelling it puts the board back as it was.
+        :return: true if a solve was started, false if one is running
+        """
+        if self.solver is not None:
             return False
+        self.board.get_history().begin()
+        self.solver = StepSolver(self.board.get_board())
+        self.paused = False
+        self.fast = False
+        self.solver.start()
+        return True
+
+    def update_solve(self, wait: float = 0) -> bool:
+        """
+        Show the next steps of the solve being watched: steps_per_frame of
+        them, or while fast forwarding as many as fit in FRAME_BUDGET.
+        :param wait: seconds to wait for each step the solver has not taken
+        yet, 0 to show only the steps already taken
+        :return: true once the board is solved, false otherwise
+        """
+        if self.solver is None or self.paused:
+            return False
+        deadline = time.perf_counter() + FRAME_BUDGET
+        shown = 0
+        while self.fast or shown < self.steps_per_frame:
+            if self.fast and time.perf_counter() > deadline:
+                break
+            event = self.solver.next_event(wait)
+            if event is None:
+                break
+            shown += 1
+            kind, row, col, number = event
+            if kind == TRY:
+                self.step = ((col, row), RED)
+            elif kind == PLACE:
+                self.board.fill(row, col, number)
+                self.step = ((col, row), GREEN)
+            elif kind == CLEAR:
+                self.board.clear(row, col)
+            elif kind == DONE:
+                self.solver = None
+                self.step = None
+                self.board.get_history().commit("solve")
+                if not number:
+                    print("This board has no solution")
+                return bool(number)
+        return False
+
+    def pause_solve(self) -> None:
+        """
+        pause the solve being watched, or go on with it if it is paused.
+        The solver thread waits once the steps not shown yet pile up.
+        :return: None
+        """
+        if self.solver is not None:
+            self.paused = not self.paused
+
+    def fast_forward(self) -> None:
+        """
+        show the steps of the solve being watched as fast as the frame
+        allows, or go back to steps_per_frame
+        :return: None
+        """
+        if self.solver is not None:
+            self.fast = not self.fast
+
+    def cancel_solve(self) -> None:
+        """
+        stop the solve being watched and take back the numbers it filled in
+        :return: None
+        """
+        if self.solver is None:
+            return
+        self.solver.cancel()
+        self.solver = None
+        self.step = None
+        self.board.get_history().abort()
 
     def fill_notes(self, number) -> bool:
         """
-        Fill a given number into the currently selected cell as a note
+        Fill a given number into the currently selected cell as a note, or
+        take it out if it is already noted there
         :param number: number to fill in as a note
         :return: True on success false otherwise
         """
         if self.selected:
-            self.board.fill_notes(self.selected[1], self.selected[0], number)
+            row, col = self.selected[1], self.selected[0]
+            with self.board.get_history().move(row, col, "note"):
+                if not self.board.remove_note(row, col, number):
+                    self.board.fill_notes(row, col, number)
             return True
         return False
 
+    def auto_notes(self) -> None:
+        """
+        turn auto notes on, noting every legal candidate in every empty
+        cell and keeping them up to date, or turn them off
+        :return: None
+        """
+        with self.board.get_history().move(name="auto notes"):
+            self.board.set_auto_notes(not self.board.auto_notes())
+
+    def undo(self) -> bool:
+        """
+        take back the last move: a number, a note, auto notes or a whole
+        watched solve
+        :return: true if there was a move to take back, false otherwise
+        """
+        self.hint = None
+        moved = self.board.get_history().undo()
+        # taking back a solve brings its empty cells back
+        self.solved = self.board.check_win()
+        return moved
+
+    def redo(self) -> bool:
+        """
+        make the last move taken back again
+        :return: true if there was a move to make, false otherwise
+        """
+        self.hint = None
+        moved = self.board.get_history().redo()
+        # taking back a solve brings its empty cells back
+        self.solved = self.board.check_win()
+        return moved
+
+    def show_hint(self) -> bool:
+        """
+        Select the easiest cell that can be filled in by logic, outline the
+        cells that prove it and print how, see Board.hint
+        :return: true if there was a hint, false if only a guess would do
+        """
+        self.hint = self.board.hint()
+        if self.hint is None:
+            print("No cell can be filled in without guessing")
+            return False
+        self.selected = (self.hint.col, self.hint.row)
+        print("Hint, {}: {}".format(self.hint.technique, self.hint.reason))
+        return True
+
     def clear_notes(self) -> None:
         """
         set the selected cell on the notes board to be 0.
         :return: None
         """
         if self.selected:
-            self.board.clear_notes(self.selected[1], self.selected[0])
+            row, col = self.selected[1], self.selected[0]
+            with self.board.get_history().move(row, col, "clear notes"):
+                self.board.clear_notes(row, col)
 
-    def clean(self, x: int, y: int) -> None:
+    def draw(self) -> List[pygame.Rect]:
         """
-        whiteout the cell with given x and y coordinates
-        :param x: x coordinate of the cell
-        :param y: y coordinate of the cell
-        :return: None
+        Draw what changed since the last frame: the cells whose number, note
+        or outline changed, the time and the strikes. The first frame draws
+        everything.
+        :return: the areas drawn on, to pass to pygame.display.update
         """
-        rect = pygame.Rect(x * self.cell_size + 20, y * self.cell_size + 20,
-                           self.cell_size - 40, self.cell_size - 40)
-        pygame.draw.rect(self.surface, WHITE, rect)
+        if self.shown is None:
+            self.draw_grid()
+        board = self.board.get_board()
+        notes = self.board.get_notes()
+        outlines = {}
+        hint = self.hint
+        if hint is not None and not board[hint.row][hint.col]:
+            for row, col in hint.support:
+                outlines[(col, row)] = BLUE
+        if self.step is not None:
+            outlines[self.step[0]] = self.step[1]
+        if self.selected:
+            outlines[self.selected] = RED
+        for row, shown in enumerate(self.shown):
+            for col in range(len(shown)):
+                number = board[row][col]
+                state = (number, 0 if self.solved or number else
+                         notes[row][col], outlines.get((col, row)))
+                if shown[col] != state:
+                    shown[col] = state
+                    self.draw_cell(col, row, *state)
+        self.draw_time()
+        self.draw_strikes()
+        dirty = self.dirty
+        self.dirty = []
+        return dirty
 
     def draw_grid(self) -> None:
         """
-        draw the 9x9 grid onto our surface
+        draw the empty grid onto our surface, and mark everything to be
+        drawn again on it
         :return: None
         """
+        size = self.board.get_size()
         self.surface.fill(WHITE)
-        for i in range(10):
-            if i % 3 == 0:
+        self.draw_lines()
+        self.shown = [[None] * size for i in range(size)]
+        self.shown_time = None
+        self.shown_strikes = None
+        self.dirty = [self.surface.get_rect()]
+
+    def draw_lines(self) -> None:
+        """
+        draw the lines of the grid, with thick lines around the squares
+        :return: None
+        """
+        for i in range(self.board.get_size() + 1):
+            if i % self.board.get_box() == 0:
                 thickness = 5
             else:
                 thickness = 1
@@ -179,6 +392,40 @@ class Game:
                              (self.cell_size * i, WINDOW_SIZE[0],),
                              thickness)
 
+    def cell_rect(self, x: int, y: int) -> pygame.Rect:
+        """
+        the area of a cell on the surface
+        :param x: x position of the cell
+        :param y: y position of the cell
+        :return: the area
+        """
+        return pygame.Rect(x * self.cell_size, y * self.cell_size,
+                           self.cell_size, self.cell_size)
+
+    def draw_cell(self, x: int, y: int, number: int, note: int,
+                  outline: Optional[Tuple[int, int, int]]) -> None:
+        """
+        Draw one cell again from scratch, only touching the cell's area
+        :param x: x position of the cell
+        :param y: y position of the cell
+        :param number: number in the cell, 0 if it is empty
+        :param note: mask of the notes in the cell, 0 if there are none
+        :param outline: color to outline the cell in, None for no outline
+        :return: None
+        """
+        rect = self.cell_rect(x, y)
+        self.surface.set_clip(rect)
+        self.surface.fill(WHITE, rect)
+        self.draw_lines()
+        if note:
+            self.draw_notes(x, y, note)
+        if number:
+            self.draw_number(x, y, number)
+        if outline:
+            self.draw_outline((x, y), outline)
+        self.surface.set_clip(None)
+        self.dirty.append(rect)
+
     def draw_outline(self, pos: Tuple[int, int],
                      color: Tuple[int, int, int]) -> None:
         """
@@ -187,9 +434,7 @@ class Game:
         :param color: color to outline with
         :return: None
         """
-        rect = pygame.Rect(pos[0] * self.cell_size, pos[1] * self.cell_size,
-                           self.cell_size, self.cell_size)
-        pygame.draw.rect(self.surface, color, rect, 5)
+        pygame.draw.rect(self.surface, color, self.cell_rect(*pos), 5)
 
     def draw_number(self, x: int, y: int, number) -> None:
         """
@@ -199,50 +444,84 @@ class Game:
         :param number: number to draw
         :return: None
         """
-        font = pygame.font.SysFont('calibri', 50)
-        text_surface = font.render(str(number), True, BLACK)
-        self.surface.blit(text_surface,
+        self.surface.blit(self.glyph(number, BLACK),
                           ((x + 0.4) * self.cell_size,
                            (y + 0.35) * self.cell_size))
 
-    def draw_numbers(self) -> None:
+    def draw_notes(self, x: int, y: int, notes: int) -> None:
         """
-        Draw all numbers in our playing board onto the surface
+        Draw the notes of a given cell in light green, as a small grid the
+        shape of a square with every number in its own place, 1 to 9 on the
+        usual board
+        :param x: x position of the cell
+        :param y: y position of the cell
+        :param notes: mask of the numbers noted, bit i stands for i + 1
         :return: None
         """
-        board = self.board.get_board()
-        for row in range(9):
-            for col in range(9):
-                if board[row][col] != 0:
-                    font = pygame.font.SysFont('calibri', 50)
-                    text_surface = font.render(str(board[row][col]),
-                                               True, BLACK)
-                    self.surface.blit(text_surface,
-                                      ((col + 0.4) * self.cell_size,
-                                       (row + 0.35) * self.cell_size))
-
-    def draw_notes(self) -> None:
-        """
-        Draw all numbers in our notes onto the surface, in light green
-        :return: None
+        box = self.board.get_box()
+        step = self.cell_size / box
+        size = self.note_size()
+        number = 0
+        while notes:
+            if notes & 1:
+                glyph = self.glyph(number + 1, LIGHT_GREEN, size)
+                self.surface.blit(glyph, (
+                    x * self.cell_size + (number % box + 0.5) * step
+                    - glyph.get_width() / 2,
+                    y * self.cell_size + (number // box + 0.5) * step
+                    - glyph.get_height() / 2))
+            notes >>= 1
+            number += 1
+
+    def font(self, size: int) -> pygame.font.Font:
         """
-        notes = self.board.get_notes()
-        for row in range(9):
-            for col in range(9):
-                if notes[row][col] != 0:
-                    font = pygame.font.SysFont('calibri', 50)
-                    text_surface = font.render(str(notes[row][col]),
-                                               True, LIGHT_GREEN)
-                    self.surface.blit(text_surface,
-                                      ((col + 0.4) * self.cell_size,
-                                       (row + 0.35) * self.cell_size))
+        the font to draw text of a given size in, only looked up and made
+        the first time it is needed
+        :param size: size of the font
+        :return: the font
+        """
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont('calibri', size)
+        return self.fonts[size]
+
+    def glyph(self, number: int, color: Tuple[int, int, int],
+              size: int = None) -> pygame.Surface:
+        """
+        a number rendered in a given color, only rendered the first time it
+        is needed
+        :param number: the number
+        :param color: color to render it in
+        :param size: font size, defaults to font_size
+        :return: the rendered number
+        """
+        size = size or self.font_size()
+        key = (number, color, size)
+        if key not in self.glyphs:
+            self.glyphs[key] = self.font(size).render(DIGITS[number], True,
+                                                      color)
+        return self.glyphs[key]
+
+    def note_size(self) -> int:
+        """
+        the size of the font notes are drawn in, so a square's worth of them
+        fit in a cell
+        :return: the font size
+        """
+        return max(int(self.cell_size / self.board.get_box() * 0.8), 6)
+
+    def font_size(self) -> int:
+        """
+        the size of the font numbers are drawn in, so they fit their cells
+        :return: the font size
+        """
+        return int(self.cell_size / 2)
 
     def draw_time(self) -> None:
         """
-        Draw the time spent so far in this game, in hours:minutes:seconds
+        Draw the time spent so far in this game, in hours:minutes:seconds,
+        if it changed since it was last drawn
         :return: None
         """
-        self.clock.tick()
         if not self.solved:
             self.time += self.clock.get_time()
         seconds_total = self.time // 1000
@@ -250,61 +529,147 @@ class Game:
         minutes_total = seconds_total // 60
         minutes = minutes_total % 60
         hours = minutes_total // 60
-        font_text = pygame.font.SysFont('calibri', 40)
-        text_surface = font_text.render("Time Passed:", True, BLACK)
-        font_num = pygame.font.SysFont('calibri', 40)
-        num_surface = font_num.render(
-            "{}:{}:{}".format(hours, minutes, seconds), True, BLACK)
+        string = "{}:{}:{}".format(hours, minutes, seconds)
+        if string == self.shown_time:
+            return
+        self.shown_time = string
+        rect = pygame.Rect(20, 920, 560, 80)
+        self.surface.fill(WHITE, rect)
+        text_surface = self.font(40).render("Time Passed:", True, BLACK)
+        num_surface = self.font(40).render(string, True, BLACK)
 
         self.surface.blit(text_surface, (20, 920))
         self.surface.blit(num_surface, (20, 960))
+        self.dirty.append(rect)
 
     def draw_strikes(self) -> None:
         """
-        Draw how many strikes have we had in this game so far
+        Draw how many strikes have we had in this game so far, if it changed
+        since it was last drawn
         :return: None
         """
+        if self.strikes == self.shown_strikes:
+            return
+        self.shown_strikes = self.strikes
         string = ''
         for i in range(self.strikes):
             string += 'X '
-        font_text = pygame.font.SysFont('calibri', 40)
-        text_surface = font_text.render("Strikes:", True, BLACK)
-        font_x = pygame.font.SysFont('calibri', 40)
-        x_surface = font_x.render(string, True, RED)
+        rect = pygame.Rect(600, 920, 300, 80)
+        self.surface.fill(WHITE, rect)
+        text_surface = self.font(40).render("Strikes:", True, BLACK)
+        x_surface = self.font(40).render(string, True, RED)
 
         self.surface.blit(text_surface, (600, 920))
         self.surface.blit(x_surface, (600, 960))
+        self.dirty.append(rect)
+
+
+def export_solve(board: List[List[int]], path: str,
+                 steps_per_frame: int = STEPS_PER_FRAME,
+                 fps: int = EXPORT_FPS) -> int:
+    """
+    Render the visual solve of a board onto an offscreen surface, with no
+    window, and save it as an animated GIF if path ends in .gif, otherwise
+    as numbered PNG frames in the directory path. Frames are rendered as
+    fast as the solver takes its steps, a frame is only saved when
+    something on it changed. GIFs need Pillow, PNG frames only pygame.
+    :param board: the board to solve, with 0 for empty cells
+    :param path: GIF file or directory to write
+    :param steps_per_frame: solve steps shown per frame
+    :param fps: frames per second of the GIF
+    :return: number of frames saved
+    """
+    gif = path.lower().endswith(".gif")
+    if gif:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError("exporting a GIF needs Pillow, pip install "
+                              "pillow, or export PNG frames to a directory")
+        frames = []
+    else:
+        os.makedirs(path, exist_ok=True)
+    surface = pygame.Surface(WINDOW_SIZE)
+    game = Game(board, surface, steps_per_frame)
+    count = 0
+    game.draw()
+    game.visual_solve()
+    while True:
+        if gif:
+            frames.append(Image.frombytes(
+                "RGB", WINDOW_SIZE, pygame.image.tobytes(surface, "RGB"))
+                .convert("P", palette=Image.ADAPTIVE))
+        else:
+            pygame.image.save(surface, os.path.join(
+                path, "frame{:05d}.png".format(count)))
+        count += 1
+        # skip frames where nothing changed, e.g. a number tried again in
+        # the cell already outlined
+        dirty = []
+        while not dirty and game.solver is not None:
+            solver = game.solver
+            if game.update_solve(EXPORT_WAIT):
+                game.solved = True
+            elif game.solver is solver and solver.events.empty() and \
+                    not solver.is_alive():
+                raise RuntimeError("the solver stopped without finishing")
+            dirty = game.draw()
+        if not dirty:
+            break
+    if gif:
+        frames[0].save(path, save_all=True, append_images=frames[1:],
+                       duration=int(1000 / fps), loop=0)
+    return count
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Play sudoku.")
+    parser.add_argument("puzzle", nargs="?",
+                        help="puzzle to play as one line of characters, "
+                             "plays the built in board if left out")
+    parser.add_argument("--export", default=None,
+                        help="render the solve without a window and save it "
+                             "as a GIF (needs Pillow), or as PNG frames in "
+                             "a directory")
+    parser.add_argument("--steps", type=int, default=STEPS_PER_FRAME,
+                        help="solve steps shown per frame")
+    parser.add_argument("--fps", type=int, default=EXPORT_FPS,
+                        help="frames per second of an exported GIF")
+    args = parser.parse_args()
+    # a puzzle given on the command line, as one line of characters, is
+    # played instead of the built in one, so bigger boards can be played
+    if args.puzzle:
+        board = parse(args.puzzle)
+    else:
+        board = [[6, 0, 2, 3, 8, 0, 0, 0, 4],
+                 [4, 0, 5, 0, 7, 0, 0, 9, 0],
+                 [0, 0, 3, 0, 5, 0, 0, 0, 0],
+                 [5, 0, 0, 8, 9, 0, 0, 2, 0],
+                 [2, 4, 9, 0, 0, 0, 5, 8, 7],
+                 [0, 3, 0, 0, 2, 4, 0, 0, 1],
+                 [0, 0, 0, 0, 4, 0, 6, 0, 0],
+                 [0, 9, 0, 0, 1, 0, 7, 0, 8],
+                 [8, 0, 0, 0, 3, 6, 2, 0, 9]]
+    if args.export:
+        # no window is opened, so this works on servers with no display
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        count = export_solve(board, args.export, args.steps, args.fps)
+        print("saved {} frames to {}".format(count, args.export))
+        return
     surface = pygame.display.set_mode(WINDOW_SIZE)
     pygame.display.set_caption("SUDOKU")
-    board = [[6, 0, 2, 3, 8, 0, 0, 0, 4],
-             [4, 0, 5, 0, 7, 0, 0, 9, 0],
-             [0, 0, 3, 0, 5, 0, 0, 0, 0],
-             [5, 0, 0, 8, 9, 0, 0, 2, 0],
-             [2, 4, 9, 0, 0, 0, 5, 8, 7],
-             [0, 3, 0, 0, 2, 4, 0, 0, 1],
-             [0, 0, 0, 0, 4, 0, 6, 0, 0],
-             [0, 9, 0, 0, 1, 0, 7, 0, 8],
-             [8, 0, 0, 0, 3, 6, 2, 0, 9]]
-    game = Game(board, surface)
+    game = Game(board, surface, args.steps)
 
     running = True
     key = None
 
     while running:
-        game.draw_grid()
-        if not game.solved:
-            game.draw_notes()
-        game.draw_numbers()
-        game.draw_time()
-        game.draw_strikes()
-
-        if game.selected:
-            game.draw_outline(game.selected, RED)
-
-        pygame.display.update()
+        if game.update_solve():
+            game.solved = True
+        # only what changed is drawn and sent to the screen, and the clock
+        # sleeps off the rest of the frame so an idle game uses no cpu
+        pygame.display.update(game.draw())
+        game.clock.tick(FPS)
 
         if game.strikes == 3:
             running = False
@@ -317,35 +682,43 @@ def main():
             if event.type == pygame.MOUSEBUTTONDOWN:
                 game.process_mbdown(pygame.mouse.get_pos())
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    key = 1
-                if event.key == pygame.K_2:
-                    key = 2
-                if event.key == pygame.K_3:
-                    key = 3
-                if event.key == pygame.K_4:
-                    key = 4
-                if event.key == pygame.K_5:
-                    key = 5
-                if event.key == pygame.K_6:
-                    key = 6
-                if event.key == pygame.K_7:
-                    key = 7
-                if event.key == pygame.K_8:
-                    key = 8
-                if event.key == pygame.K_9:
-                    key = 9
-                if key:
-                    game.fill_notes(key)
-                if event.key == pygame.K_DELETE:
-                    game.clear_notes()
+                # numbers above 9 are typed as the letters standing for
+                # them, a for 10
+                name = pygame.key.name(event.key).upper()
+                control = event.mod & pygame.KMOD_CTRL
+                if len(name) == 1 and 0 < DIGITS.find(name) <= \
+                        game.board.get_size() and not control:
+                    key = DIGITS.index(name)
+                # the board is left to the solver while it is watched
+                if game.solver is None and control:
+                    if event.key == pygame.K_z and \
+                            event.mod & pygame.KMOD_SHIFT:
+                        game.redo()
+                    elif event.key == pygame.K_z:
+                        game.undo()
+                    if event.key == pygame.K_y:
+                        game.redo()
+                elif game.solver is None:
+                    if key:
+                        game.fill_notes(key)
+                    if event.key == pygame.K_DELETE:
+                        game.clear_notes()
+                    if event.key == pygame.K_RETURN:
+                        game.fill_solution()
+                    if event.key == pygame.K_TAB:
+                        game.auto_notes()
+                    if event.key == pygame.K_SLASH:
+                        game.show_hint()
                 if event.key == pygame.K_SPACE:
-                    if game.visual_solve():
-                        game.solved = True
-                if event.key == pygame.K_RETURN:
-                    game.fill_solution()
+                    if not game.visual_solve():
+                        game.pause_solve()
+                if event.key == pygame.K_RIGHT:
+                    game.fast_forward()
+                if event.key == pygame.K_ESCAPE:
+                    game.cancel_solve()
             key = None
 
+    game.cancel_solve()
     pygame.quit()
 
 
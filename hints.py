@@ -0,0 +1,352 @@
+from __future__ import annotations
+from typing import List, Optional, Tuple, TYPE_CHECKING
+from logic import *
+from puzzle_io import DIGITS
+if TYPE_CHECKING:
+    from board import Board
+"""
+Hints for a player who is stuck: the easiest cell that can be filled in by
+logic alone, with the technique that proves it and the cells it rests on.
+"""
+
+# techniques in the order a person would look for them, easiest first,
+# every hint fills a cell with a single, the others only remove candidates
+# to get to one
+LADDER = (HIDDEN_SINGLE, NAKED_SINGLE, LOCKED_CANDIDATES, NAKED_PAIR)
+
+
+class Hint:
+    """
+    A cell that can be filled in by logic, and why.
+
+    ---Attributes---
+    row: row of the cell
+    col: column of the cell
+    number: number that goes in it
+    technique: the hardest technique needed to prove it, from LADDER
+    support: the cells the proof rests on, as (row, col) pairs
+    reason: the proof, in words
+    """
+    row: int
+    col: int
+    number: int
+    technique: str
+    support: List[Tuple[int, int]]
+    reason: str
+
+    def __init__(self, row: int, col: int, number: int, technique: str,
+                 support: List[Tuple[int, int]], reason: str):
+        self.row = row
+        self.col = col
+        self.number = number
+        self.technique = technique
+        self.support = support
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return "Hint({}, {}, {}, {!r})".format(self.row, self.col,
+                                               self.number, self.technique)
+
+
+class HintEngine:
+    """
+    Finds hints on a board. The candidates of every cell are kept between
+    hints and only the cells that changed since the last one are looked at,
+    so a hint after a move costs little more than finding the deduction.
+
+    ---Attributes---
+    _board: the board to find hints on
+    _layout: units and peers of the board
+    _values: the number in every cell when the candidates were last brought
+    up to date, 0 if empty
+    _cands: mask of the numbers still possible in every empty cell, bit i
+    stands for the number i + 1, minus the ones ruled out by eliminations
+    _hint: the last hint found, given again until the board changes
+    """
+    _board: Board
+    _layout: Layout
+    _values: List[int]
+    _cands: List[int]
+    _hint: Optional[Hint]
+
+    def __init__(self, board: Board):
+        """
+        :param board: the board to find hints on
+        """
+        self._board = board
+        self._layout = layout(board.get_box())
+        self._values = []
+        self._cands = []
+        self._hint = None
+        self._rebuild()
+
+    def hint(self) -> Optional[Hint]:
+        """
+        Find the easiest cell that can be filled in by logic. When no single
+        shows up, locked candidates and naked pairs are used to rule out
+        candidates until one does, and they stay ruled out for later hints.
+        :return: the hint, None if the board is full, broken or needs a
+        guess
+        """
+        if self._sync() and self._hint is not None:
+            return self._hint
+        self._hint = None
+        steps = []
+        while True:
+            hint = self._single()
+            if hint is not None:
+                break
+            for technique, find in ((LOCKED_CANDIDATES, self._locked),
+                                    (NAKED_PAIR, self._pairs)):
+                step = find()
+                if step is not None:
+                    steps.append((technique,) + step)
+                    break
+            else:
+                return None
+        if steps:
+            hint.technique = max((step[0] for step in steps),
+                                 key=LADDER.index)
+            hint.support = _unique([cell for step in steps
+                                    for cell in step[1]] + hint.support)
+            hint.reason = "; ".join([step[2] for step in steps]
+                                    + ["so " + hint.reason])
+        self._hint = hint
+        return hint
+
+    def _rebuild(self) -> None:
+        """
+        work the candidates out again from the board
+        :return: None
+        """
+        board = self._board
+        size = self._layout.size
+        self._values = [board.get(cell // size, cell % size)
+                        for cell in range(self._layout.cells)]
+        self._cands = [board.candidate_mask(cell // size, cell % size)
+                       for cell in range(self._layout.cells)]
+
+    def _sync(self) -> bool:
+        """
+        bring the candidates up to date with the board, taking filled
+        numbers out of their peers. Clearing a cell can bring back
+        candidates an elimination removed, so then they are worked out
+        again from scratch.
+        :return: true if the board had not changed, false otherwise
+        """
+        board = self._board.get_board()
+        size = self._layout.size
+        values = self._values
+        cands = self._cands
+        peers = self._layout.peers
+        unchanged = True
+        for cell in range(self._layout.cells):
+            number = board[cell // size][cell % size]
+            if number == values[cell]:
+                continue
+            unchanged = False
+            if values[cell]:
+                self._rebuild()
+                return False
+            values[cell] = number
+            cands[cell] = 0
+            mask = ~(1 << (number - 1))
+            for peer in peers[cell]:
+                cands[peer] &= mask
+        return unchanged
+
+    def _single(self) -> Optional[Hint]:
+        """
+        find a hidden single, looking in the squares first, or a naked
+        single
+        :return: the hint, None if there is no single
+        """
+        grid = self._layout
+        values = self._values
+        cands = self._cands
+        for units, name in ((grid.boxes, "square"), (grid.rows, "row"),
+                            (grid.cols, "column")):
+            for index, unit in enumerate(units):
+                once = 0
+                twice = 0
+                for cell in unit:
+                    if not values[cell]:
+                        twice |= once & cands[cell]
+                        once |= cands[cell]
+                single = once & ~twice
+                if single:
+                    bit = single & -single
+                    for cell in unit:
+                        if cands[cell] & bit:
+                            break
+                    number = bit.bit_length()
+                    support = [self._blocker(other, number) for other in unit
+                               if other != cell and not values[other]]
+                    return self._hint_at(
+                        cell, number, HIDDEN_SINGLE,
+                        [pos for pos in support if pos is not None],
+                        "{} can only go in {} in {} {}".format(
+                            DIGITS[number], _name(cell, grid.size), name,
+                            index + 1))
+        for cell in range(grid.cells):
+            mask = cands[cell]
+            if not values[cell] and mask and mask & (mask - 1) == 0:
+                number = mask.bit_length()
+                support = [self._blocker(cell, other)
+                           for other in range(1, grid.size + 1)
+                           if other != number]
+                return self._hint_at(
+                    cell, number, NAKED_SINGLE,
+                    [pos for pos in support if pos is not None],
+                    "{} is the only number left for {}".format(
+                        DIGITS[number], _name(cell, grid.size)))
+        return None
+
+    def _hint_at(self, cell: int, number: int, technique: str,
+                 support: List[Tuple[int, int]], reason: str) -> Hint:
+        """
+        make a hint for a cell
+        :param cell: the cell
+        :param number: number that goes in it
+        :param technique: technique that proves it
+        :param support: cells the proof rests on
+        :param reason: the proof, in words
+        :return: the hint
+        """
+        size = self._layout.size
+        return Hint(cell // size, cell % size, number, technique,
+                    _unique(support), reason)
+
+    def _blocker(self, cell: int, number: int) -> Optional[Tuple[int, int]]:
+        """
+        find a filled peer of a cell that holds a number, so the number can
+        not go in the cell
+        :param cell: the cell
+        :param number: the number
+        :return: position of the peer, None if no peer holds the number
+        """
+        values = self._values
+        size = self._layout.size
+        for peer in self._layout.peers[cell]:
+            if values[peer] == number:
+                return peer // size, peer % size
+        return None
+
+    def _locked(self) -> Optional[Tuple[List[Tuple[int, int]], str]]:
+        """
+        find a number that can only go in one row or column of a square, or
+        in one square of a row or column, and remove it from the rest of
+        that row, column or square
+        :return: the cells the pattern is made of and what it removed, None
+        if there is no pattern that removes anything
+        """
+        grid = self._layout
+        size = grid.size
+        cands = self._cands
+        boxes = [(unit, grid.box_of[unit[0]], "square {}".format(index + 1))
+                 for index, unit in enumerate(grid.boxes)]
+        lines = [(unit, None, "{} {}".format(name, index + 1))
+                 for units, name in ((grid.rows, "row"), (grid.cols, "column"))
+                 for index, unit in enumerate(units)]
+        for unit, box, name in boxes + lines:
+            for number in range(1, size + 1):
+                bit = 1 << (number - 1)
+                cells = [cell for cell in unit if cands[cell] & bit]
+                if len(cells) < 2:
+                    continue
+                if box is None:
+                    # claiming, the line's cells all in one square
+                    if len({grid.box_of[cell] for cell in cells}) != 1:
+                        continue
+                    others = [cell for cell in grid.boxes[grid.box_of[
+                        cells[0]]] if cell not in unit]
+                    where = "square {}".format(grid.box_of[cells[0]] + 1)
+                elif len({cell // size for cell in cells}) == 1:
+                    others = [cell for cell in grid.rows[cells[0] // size]
+                              if grid.box_of[cell] != box]
+                    where = "row {}".format(cells[0] // size + 1)
+                elif len({cell % size for cell in cells}) == 1:
+                    others = [cell for cell in grid.cols[cells[0] % size]
+                              if grid.box_of[cell] != box]
+                    where = "column {}".format(cells[0] % size + 1)
+                else:
+                    continue
+                if self._eliminate(others, bit):
+                    return ([(cell // size, cell % size) for cell in cells],
+                            "in {}, {} can only go in {}, so it is ruled "
+                            "out of the rest of {}".format(
+                                name, DIGITS[number],
+                                " and ".join(_name(cell, size)
+                                             for cell in cells), where))
+        return None
+
+    def _pairs(self) -> Optional[Tuple[List[Tuple[int, int]], str]]:
+        """
+        find two cells of a row, column or square with the same two numbers
+        left, and remove those numbers from the rest of it
+        :return: the two cells and what they removed, None if there is no
+        pair that removes anything
+        """
+        grid = self._layout
+        size = grid.size
+        cands = self._cands
+        units = [(unit, "{} {}".format(name, index + 1))
+                 for units, name in ((grid.rows, "row"), (grid.cols, "column"),
+                                     (grid.boxes, "square"))
+                 for index, unit in enumerate(units)]
+        for unit, name in units:
+            seen = {}
+            for cell in unit:
+                mask = cands[cell]
+                if mask and bin(mask).count("1") == 2:
+                    if mask in seen:
+                        pair = (seen[mask], cell)
+                        others = [other for other in unit
+                                  if other not in pair]
+                        if self._eliminate(others, mask):
+                            numbers = [DIGITS[number]
+                                       for number in range(1, size + 1)
+                                       if mask >> (number - 1) & 1]
+                            return ([(c // size, c % size) for c in pair],
+                                    "{} and {} hold the pair {}, so those "
+                                    "numbers are ruled out of the rest of "
+                                    "{}".format(_name(pair[0], size),
+                                                _name(pair[1], size),
+                                                " and ".join(numbers), name))
+                    else:
+                        seen[mask] = cell
+        return None
+
+    def _eliminate(self, cells: List[int], mask: int) -> bool:
+        """
+        remove the numbers in mask from the candidates of the given cells
+        :param cells: cells to remove from
+        :param mask: numbers to remove
+        :return: true if anything was removed, false otherwise
+        """
+        removed = False
+        cands = self._cands
+        for cell in cells:
+            if cands[cell] & mask:
+                cands[cell] &= ~mask
+                removed = True
+        return removed
+
+
+def _name(cell: int, size: int) -> str:
+    """
+    name a cell the way a player counts, from 1
+    :param cell: the cell
+    :param size: side of the board
+    :return: e.g. r1c5
+    """
+    return "r{}c{}".format(cell // size + 1, cell % size + 1)
+
+
+def _unique(cells: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    drop repeated cells, keeping the first of each
+    :param cells: the cells
+    :return: the cells, in order, each once
+    """
+    return list(dict.fromkeys(cells))
@@ -0,0 +1,291 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from board import Board
+"""
+Move history for a player: undo, redo and named snapshots. Every state of
+the board is stored as the cells that changed since the state before it, so
+states share everything else and going from one to another only touches
+the cells that differ on the way.
+"""
+
+# a cell that changed, (row, col, number before, notes before, number after,
+# notes after)
+Change = Tuple[int, int, int, int, int, int]
+
+
+class State:
+    """
+    One state of the board in the history. The states form a tree, every
+    move adds a child to the state it was made in, so going back and making
+    a different move starts a branch and keeps the old one.
+
+    ---Attributes---
+    parent: the state the move was made in, None for the first state
+    changes: the cells the move changed
+    auto_notes: whether auto notes are on in this state
+    name: what the move was, e.g. for a list of moves
+    depth: moves from the first state
+    redo: the child redo goes to, the one most recently left or made
+    """
+    __slots__ = ("parent", "changes", "auto_notes", "name", "depth", "redo")
+
+    parent: Optional[State]
+    changes: Tuple[Change, ...]
+    auto_notes: bool
+    name: str
+    depth: int
+    redo: Optional[State]
+
+    def __init__(self, parent: Optional[State], changes: Tuple[Change, ...],
+                 auto_notes: bool, name: str = ""):
+        self.parent = parent
+        self.changes = changes
+        self.auto_notes = auto_notes
+        self.name = name
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.redo = None
+
+    def __repr__(self) -> str:
+        return "State({!r}, depth={}, changes={})".format(
+            self.name, self.depth, len(self.changes))
+
+
+class History:
+    """
+    The moves made on a board. A move is recorded by looking at the cells
+    it can touch before and after it, see begin and commit, so the board's
+    own methods, which the solver also runs, pay nothing for it. Changes
+    made to the board outside a move, e.g. by reset, are not tracked.
+
+    ---Attributes---
+    _board: the board the moves are made on
+    _current: the state the board is in
+    _snapshots: states saved by name
+    _open: the cells of the move in progress as they were when it began,
+    None if no move is in progress
+    _open_auto: whether auto notes were on when the move began
+    """
+    _board: Board
+    _current: State
+    _snapshots: Dict[str, State]
+    _open: Optional[List[Tuple[int, int, int, int]]]
+    _open_auto: bool
+
+    def __init__(self, board: Board):
+        """
+        :param board: the board the moves are made on, as it is now is the
+        first state
+        """
+        self._board = board
+        self._current = State(None, (), board.auto_notes(), "start")
+        self._snapshots = {}
+        self._open = None
+        self._open_auto = False
+
+    def begin(self, row: int = None, col: int = None) -> None:
+        """
+        Start a move. The cells it can change are remembered: a cell and
+        its peers, whose notes lose the number filled in or get it back, or
+        every cell if no cell is given
+        :param row: row of the cell the move is made in
+        :param col: col of the cell the move is made in
+        :return: None
+        """
+        board = self._board
+        if row is None:
+            size = board.get_size()
+            cells = [(r, c) for r in range(size) for c in range(size)]
+        else:
+            cells = [(row, col)] + board._layout.peer_pairs[row][col]
+        grid = board.get_board()
+        notes = board.get_notes()
+        self._open = [(r, c, grid[r][c], notes[r][c]) for r, c in cells]
+        self._open_auto = board.auto_notes()
+
+    def commit(self, name: str = "") -> bool:
+        """
+        End the move started with begin and add it to the history if it
+        changed anything. The moves that could be redone are left on their
+        own branch.
+        :param name: what the move was
+        :return: true if the move changed the board, false otherwise
+        """
+        if self._open is None:
+            return False
+        grid = self._board.get_board()
+        notes = self._board.get_notes()
+        changes = tuple((r, c, number, mask, grid[r][c], notes[r][c])
+                        for r, c, number, mask in self._open
+                        if grid[r][c] != number or notes[r][c] != mask)
+        auto = self._board.auto_notes()
+        self._open = None
+        if not changes and auto == self._open_auto:
+            return False
+        state = State(self._current, changes, auto, name)
+        self._current.redo = state
+        self._current = state
+        return True
+
+    def abort(self) -> None:
+        """
+        End the move started with begin by putting back every cell it
+        changed
+        :return: None
+        """
+        if self._open is None:
+            return
+        self._board._put_cells(self._open, self._open_auto)
+        self._open = None
+
+    @contextmanager
+    def move(self, row: int = None, col: int = None,
+             name: str = "") -> Iterator[None]:
+        """
+        Record what is done inside a with block as one move, see begin
+        :param row: row of the cell the move is made in
+        :param col: col of the cell the move is made in
+        :param name: what the move was
+        :return: None
+        """
+        self.begin(row, col)
+        try:
+            yield
+        finally:
+            self.commit(name)
+
+    def undo(self) -> bool:
+        """
+        take back the last move
+        :return: true if there was a move to take back, false otherwise
+        """
+        state = self._current
+        if state.parent is None:
+            return False
+        self._back(state)
+        state.parent.redo = state
+        self._current = state.parent
+        return True
+
+    def redo(self) -> bool:
+        """
+        make the last move taken back again
+        :return: true if there was a move to make, false otherwise
+        """
+        state = self._current.redo
+        if state is None:
+            return False
+        self._forward(state)
+        self._current = state
+        return True
+
+    def can_undo(self) -> bool:
+        """
+        Check whether there is a move to take back
+        :return: true if there is, false otherwise
+        """
+        return self._current.parent is not None
+
+    def can_redo(self) -> bool:
+        """
+        Check whether there is a move to make again
+        :return: true if there is, false otherwise
+        """
+        return self._current.redo is not None
+
+    def snapshot(self, name: str) -> None:
+        """
+        Save the state the board is in under a name. It only keeps a
+        reference to the state, so it costs nothing however big the board.
+        :param name: name to save it as, replacing any state saved as it
+        :return: None
+        """
+        self._snapshots[name] = self._current
+
+    def restore(self, name: str) -> None:
+        """
+        Put the board back in a state saved with snapshot. Only the cells
+        changed by the moves between the two states are touched, and the
+        moves made since stay on their own branch, so they can be gone back
+        to with another snapshot or, from where they started, with redo.
+        :param name: name the state was saved as
+        :return: None
+        """
+        if name not in self._snapshots:
+            raise KeyError("no snapshot named {!r}".format(name))
+        self.goto(self._snapshots[name])
+
+    def snapshots(self) -> List[str]:
+        """
+        return the names of the saved states
+        :return: the names, in the order they were first saved
+        """
+        return list(self._snapshots)
+
+    def state(self) -> State:
+        """
+        return the state the board is in, which can be gone back to with
+        goto
+        :return: the state
+        """
+        return self._current
+
+    def moves(self) -> List[State]:
+        """
+        return the moves that led to the state the board is in
+        :return: the states after each move, first move first
+        """
+        path = []
+        state = self._current
+        while state.parent is not None:
+            path.append(state)
+            state = state.parent
+        path.reverse()
+        return path
+
+    def goto(self, target: State) -> None:
+        """
+        Put the board in any state of the history: take back moves up to
+        the state both branches share, then make the moves down to the
+        target
+        :param target: the state to go to
+        :return: None
+        """
+        here = self._current
+        down = []
+        while here.depth > target.depth:
+            self._back(here)
+            here = here.parent
+        state = target
+        while state.depth > here.depth:
+            down.append(state)
+            state = state.parent
+        while here is not state:
+            self._back(here)
+            here = here.parent
+            down.append(state)
+            state = state.parent
+        for state in reversed(down):
+            state.parent.redo = state
+            self._forward(state)
+        self._current = target
+
+    def _back(self, state: State) -> None:
+        """
+        take back the move that led to a state
+        :param state: the state to leave for its parent
+        :return: None
+        """
+        self._board._put_cells([change[:4] for change in state.changes],
+                               state.parent.auto_notes)
+
+    def _forward(self, state: State) -> None:
+        """
+        make the move that leads to a state, from its parent
+        :param state: the state to go to
+        :return: None
+        """
+        self._board._put_cells([change[:2] + change[4:]
+                                for change in state.changes],
+                               state.auto_notes)
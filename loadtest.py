@@ -0,0 +1,136 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+from bench import CORPORA_DIR, percentile
+from puzzle_io import read_puzzles
+"""
+Load test for server.py: keeps a number of connections busy sending solve
+requests for the puzzles in a file, then reports requests per second, the
+latency percentiles and how many requests got each status.
+"""
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  path: str, body: dict) -> Tuple[int, dict]:
+    """
+    send one request on an open connection and read the reply
+    :param reader: the connection's input
+    :param writer: the connection's output
+    :param path: endpoint to post to
+    :param body: the request
+    :return: the status and the reply
+    """
+    data = json.dumps(body).encode()
+    writer.write("POST {} HTTP/1.1\r\nHost: localhost\r\nContent-Type: "
+                 "application/json\r\nContent-Length: {}\r\n\r\n".format(
+                     path, len(data)).encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host: str, port: int, path: str, bodies: List[dict],
+                 next_body: List[int], until: float,
+                 latencies: List[float], statuses: Dict[int, int]) -> None:
+    """
+    send requests on one connection until the bodies run out or time is up
+    :param host: server address
+    :param port: server port
+    :param path: endpoint to post to
+    :param bodies: the requests, shared by every client
+    :param next_body: index of the next request to send, shared
+    :param until: time.perf_counter() to stop at
+    :param latencies: seconds every request took, appended to
+    :param statuses: requests that got each status, counted into
+    :return: None
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while next_body[0] < len(bodies) and time.perf_counter() < until:
+            body = bodies[next_body[0]]
+            next_body[0] += 1
+            start = time.perf_counter()
+            status, reply = await request(reader, writer, path, body)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    run the load test and print its report
+    :param args: parsed command line arguments
+    :return: None
+    """
+    puzzles = list(read_puzzles(args.file))
+    if not puzzles:
+        sys.exit("no puzzles in {}".format(args.file))
+    bodies = []
+    for i in range(args.requests):
+        body = {"puzzle": puzzles[i % len(puzzles)].strip()}
+        if args.endpoint == "solve":
+            body["engine"] = args.engine
+        if args.timeout:
+            body["timeout"] = args.timeout
+        bodies.append(body)
+    latencies = []
+    statuses = {}
+    next_body = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, "/" + args.endpoint,
+                                  bodies, next_body, start + args.duration,
+                                  latencies, statuses)
+                           for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    print("{} requests in {:.2f}s over {} connections, {:.1f} requests/s"
+          .format(len(latencies), elapsed, args.concurrency,
+                  len(latencies) / elapsed if elapsed else 0))
+    print("latency ms: p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        *(percentile(latencies, percent) * 1000
+          for percent in (50, 95, 99, 100))))
+    print("status: " + ", ".join("{} x{}".format(status, count)
+                                 for status, count in sorted(
+                                     statuses.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test a running server.py.")
+    parser.add_argument("file", nargs="?",
+                        default="{}/hard.txt".format(CORPORA_DIR),
+                        help="puzzles to send, defaults to the hard corpus")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="server address")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="server port")
+    parser.add_argument("--endpoint", default="solve",
+                        choices=("solve", "count", "validate"),
+                        help="endpoint to load")
+    parser.add_argument("--engine", default="backtrack",
+                        help="solver engine to ask for")
+    parser.add_argument("-n", "--requests", type=int, default=1000,
+                        help="requests to send in all")
+    parser.add_argument("-c", "--concurrency", type=int, default=16,
+                        help="connections sending requests at once")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="stop sending after this many seconds")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="per request timeout to ask for, in seconds")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
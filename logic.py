@@ -0,0 +1,354 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from board import Board
+    from stats import SolverHook
+"""
+Logical deductions used to fill in cells without guessing.
+"""
+
+NAKED_SINGLE = "naked single"
+HIDDEN_SINGLE = "hidden single"
+LOCKED_CANDIDATES = "locked candidates"
+NAKED_PAIR = "naked pair"
+
+# techniques in the order they are tried, easiest first
+SINGLES = (NAKED_SINGLE, HIDDEN_SINGLE)
+ALL_TECHNIQUES = (NAKED_SINGLE, HIDDEN_SINGLE, LOCKED_CANDIDATES, NAKED_PAIR)
+
+
+class Layout:
+    """
+    How the cells of a board with box x box squares are grouped. Cells are
+    numbered row * size + col.
+
+    ---Attributes---
+    box: side of a square
+    size: side of the board, box * box, also the largest number
+    cells: number of cells on the board
+    full: mask with a bit for every number, bit i stands for the number i + 1
+    rows: the cells of every row
+    cols: the cells of every column
+    boxes: the cells of every square, row major from the top left square
+    units: rows, then columns, then squares
+    box_of: the square every cell is in
+    peers: for every cell, the other cells sharing a unit with it
+    peer_pairs: peers as (row, col) pairs, indexed [row][col]
+    """
+    box: int
+    size: int
+    cells: int
+    full: int
+    rows: List[List[int]]
+    cols: List[List[int]]
+    boxes: List[List[int]]
+    units: List[List[int]]
+    box_of: List[int]
+    peers: List[List[int]]
+    peer_pairs: List[List[List[Tuple[int, int]]]]
+
+    def __init__(self, box: int):
+        """
+        Work out the units and peers of a board
+        :param box: side of a square, 3 for the usual 9x9 board
+        """
+        size = box * box
+        self.box = box
+        self.size = size
+        self.cells = size * size
+        self.full = (1 << size) - 1
+        self.rows = [[row * size + col for col in range(size)]
+                     for row in range(size)]
+        self.cols = [[row * size + col for row in range(size)]
+                     for col in range(size)]
+        self.boxes = [[(sqr // box * box + i // box) * size
+                       + sqr % box * box + i % box for i in range(size)]
+                      for sqr in range(size)]
+        self.units = self.rows + self.cols + self.boxes
+        self.box_of = [cell // size // box * box + cell % size // box
+                       for cell in range(self.cells)]
+        self.peers = [sorted(set(self.rows[cell // size]
+                                 + self.cols[cell % size]
+                                 + self.boxes[self.box_of[cell]]) - {cell})
+                      for cell in range(self.cells)]
+        self.peer_pairs = [[[(peer // size, peer % size)
+                             for peer in self.peers[row * size + col]]
+                            for col in range(size)]
+                           for row in range(size)]
+
+
+_LAYOUTS = {}
+
+
+def layout(box: int = 3) -> Layout:
+    """
+    Return the layout of a board with box x box squares, built once per box
+    size and shared after that
+    :param box: side of a square
+    :return: the layout
+    """
+    if box not in _LAYOUTS:
+        _LAYOUTS[box] = Layout(box)
+    return _LAYOUTS[box]
+
+
+class Propagator:
+    """
+    Applies logical deductions to a board until none of them make any more
+    progress, filling in every cell it can prove.
+
+    ---Attributes---
+    techniques: names of the techniques to apply
+    counts: how many times each technique made progress, over every run
+    hook: told every time a technique makes progress, None for no hook
+    _board: the board to fill cells in
+    _layout: units and peers of the board
+    _values: the number in every cell, 0 if empty
+    _cands: mask of the numbers still possible in every empty cell, bit i
+    stands for the number i + 1
+    _placed: the cells filled in during the current run
+    """
+    techniques: Tuple[str, ...]
+    counts: Dict[str, int]
+    hook: Optional[SolverHook]
+    _board: Board
+    _layout: Layout
+    _values: List[int]
+    _cands: List[int]
+    _placed: List[Tuple[int, int]]
+
+    def __init__(self, board: Board,
+                 techniques: Tuple[str, ...] = SINGLES,
+                 hook: SolverHook = None):
+        """
+        Initialize a propagator for the given board
+        :param board: the board to fill cells in
+        :param techniques: names of the techniques to apply
+        :param hook: told every time a technique makes progress
+        """
+        self.techniques = techniques
+        self.counts = dict.fromkeys(ALL_TECHNIQUES, 0)
+        self.hook = hook
+        self._board = board
+        self._layout = layout(board.get_box())
+        self._values = []
+        self._cands = []
+        self._placed = []
+
+    def run(self, placed: List[Tuple[int, int]]) -> bool:
+        """
+        Fill in cells until no technique makes any progress. Every filled
+        cell is appended to placed, even when a contradiction is found, so
+        the caller can clear them again when backtracking.
+        :param placed: list to record the filled cells in
+        :return: false if the board was found to have no solution
+        """
+        if not self.techniques:
+            return True
+        board = self._board
+        size = self._layout.size
+        self._values = [board.get(cell // size, cell % size)
+                        for cell in range(self._layout.cells)]
+        self._cands = [board.candidate_mask(cell // size, cell % size)
+                       for cell in range(self._layout.cells)]
+        self._placed = placed
+        while True:
+            progress = 0
+            for technique in self.techniques:
+                progress = _TECHNIQUES[technique](self)
+                if progress < 0:
+                    return False
+                if progress:
+                    self.counts[technique] += progress
+                    if self.hook is not None:
+                        self.hook.technique(technique, progress)
+                    break
+            if not progress:
+                return True
+
+    def _place(self, cell: int, number: int) -> bool:
+        """
+        fill a cell on the board and remove the number from its peers
+        :param cell: the cell to fill
+        :param number: the number to fill it with
+        :return: false if the board refused the move
+        """
+        size = self._layout.size
+        if not self._board.fill(cell // size, cell % size, number):
+            return False
+        self._placed.append((cell // size, cell % size))
+        self._values[cell] = number
+        self._cands[cell] = 0
+        mask = ~(1 << (number - 1))
+        cands = self._cands
+        for peer in self._layout.peers[cell]:
+            cands[peer] &= mask
+        return True
+
+    def naked_singles(self) -> int:
+        """
+        fill every empty cell that has only one possible number left
+        :return: number of cells filled, -1 on a contradiction
+        """
+        filled = 0
+        values = self._values
+        cands = self._cands
+        for cell in range(self._layout.cells):
+            if values[cell] == 0:
+                mask = cands[cell]
+                if mask == 0:
+                    return -1
+                if mask & (mask - 1) == 0:
+                    if not self._place(cell, mask.bit_length()):
+                        return -1
+                    filled += 1
+        return filled
+
+    def hidden_singles(self) -> int:
+        """
+        fill every number that has only one possible cell left in a row,
+        column or square
+        :return: number of cells filled, -1 on a contradiction
+        """
+        filled = 0
+        values = self._values
+        cands = self._cands
+        full = self._layout.full
+        for unit in self._layout.units:
+            used = 0
+            once = 0
+            twice = 0
+            for cell in unit:
+                if values[cell]:
+                    used |= 1 << (values[cell] - 1)
+                else:
+                    twice |= once & cands[cell]
+                    once |= cands[cell]
+            if used | once != full:
+                return -1
+            single = once & ~twice
+            while single:
+                bit = single & -single
+                single ^= bit
+                for cell in unit:
+                    if cands[cell] & bit:
+                        break
+                else:
+                    # an earlier fill in this unit took the only cell
+                    return -1
+                if not self._place(cell, bit.bit_length()):
+                    return -1
+                filled += 1
+        return filled
+
+    def locked_candidates(self) -> int:
+        """
+        When a number can only go in one row or column of a square, remove
+        it from the rest of that row or column (pointing). When it can only
+        go in one square of a row or column, remove it from the rest of that
+        square (claiming).
+        :return: number of patterns that removed a candidate
+        """
+        found = 0
+        cands = self._cands
+        grid = self._layout
+        for box in grid.boxes:
+            for lines, line_of in ((grid.rows, _row_of), (grid.cols, _col_of)):
+                for bit in _bits(grid.full):
+                    found_in = {line_of(cell, grid.size) for cell in box
+                                if cands[cell] & bit}
+                    if len(found_in) == 1:
+                        others = [cell for cell in lines[found_in.pop()]
+                                  if grid.box_of[cell] != grid.box_of[box[0]]]
+                        found += self._eliminate(others, bit)
+        for line in grid.rows + grid.cols:
+            for bit in _bits(grid.full):
+                found_in = {grid.box_of[cell] for cell in line
+                            if cands[cell] & bit}
+                if len(found_in) == 1:
+                    others = [cell for cell in grid.boxes[found_in.pop()]
+                              if cell not in line]
+                    found += self._eliminate(others, bit)
+        return found
+
+    def naked_pairs(self) -> int:
+        """
+        When two cells in a row, column or square have the same two numbers
+        left, remove those numbers from the rest of that unit
+        :return: number of pairs that removed a candidate
+        """
+        found = 0
+        cands = self._cands
+        for unit in self._layout.units:
+            seen = {}
+            for cell in unit:
+                mask = cands[cell]
+                if mask and _bit_count(mask) == 2:
+                    if mask in seen:
+                        others = [other for other in unit
+                                  if other != cell and other != seen[mask]]
+                        found += self._eliminate(others, mask)
+                    else:
+                        seen[mask] = cell
+        return found
+
+    def _eliminate(self, cells: List[int], mask: int) -> int:
+        """
+        remove the numbers in mask from the candidates of the given cells
+        :param cells: cells to remove from
+        :param mask: numbers to remove
+        :return: 1 if anything was removed, 0 otherwise
+        """
+        removed = 0
+        cands = self._cands
+        for cell in cells:
+            if cands[cell] & mask:
+                cands[cell] &= ~mask
+                removed = 1
+        return removed
+
+
+_TECHNIQUES = {
+    NAKED_SINGLE: Propagator.naked_singles,
+    HIDDEN_SINGLE: Propagator.hidden_singles,
+    LOCKED_CANDIDATES: Propagator.locked_candidates,
+    NAKED_PAIR: Propagator.naked_pairs,
+}
+
+
+def _bits(mask: int) -> List[int]:
+    """
+    split a mask into its set bits
+    :param mask: the mask
+    :return: the bits, lowest first
+    """
+    return [1 << i for i in range(mask.bit_length()) if mask & (1 << i)]
+
+
+def _bit_count(mask: int) -> int:
+    """
+    count the set bits in a mask
+    :param mask: the mask
+    :return: number of bits set
+    """
+    return bin(mask).count("1")
+
+
+def _row_of(cell: int, size: int) -> int:
+    """
+    row of a cell
+    :param cell: the cell
+    :param size: side of the board
+    :return: row index
+    """
+    return cell // size
+
+
+def _col_of(cell: int, size: int) -> int:
+    """
+    column of a cell
+    :param cell: the cell
+    :param size: side of the board
+    :return: column index
+    """
+    return cell % size
@@ -0,0 +1,265 @@
+from __future__ import annotations
+import mmap
+import sys
+from math import isqrt
+from typing import Iterable, Iterator, List
+import numpy as np
+"""
+Reading and writing puzzles.
+
+Text files hold one puzzle per line as 81 characters, with 0 or . for empty
+cells. Bigger boards use size * size characters on a line, with the letters
+A to P standing for 10 to 25. Anything after the first whitespace on a line
+is ignored, so the output of generate.py can be read back directly, and
+blank lines and lines starting with # are skipped.
+
+Binary files start with MAGIC followed by one RECORD byte record per puzzle,
+two cells per byte (high nibble first), so a puzzle can be found by index
+without reading the ones before it. They only hold 9x9 puzzles.
+"""
+
+MAGIC = b"SUDOKU4\n"
+RECORD = 41
+
+# the character for every number, 0 for an empty cell
+DIGITS = "0123456789ABCDEFGHIJKLMNOP"
+
+
+def parse(line: str) -> List[List[int]]:
+    """
+    Turn a puzzle written on one line, with 0 or . for empty cells, into a
+    board. The board is 9x9 for 81 characters, 16x16 for 256 and 25x25
+    for 625.
+    :param line: the puzzle
+    :return: board in list of list of int format
+    """
+    line = line.strip().replace(".", "0").upper()
+    size = isqrt(len(line))
+    box = isqrt(size)
+    if (size * size != len(line) or box * box != size
+            or any(DIGITS.find(char) < 0 or DIGITS.find(char) > size
+                   for char in line)):
+        raise ValueError("not a sudoku puzzle: {!r}".format(line))
+    return [[DIGITS.index(line[row * size + col]) for col in range(size)]
+            for row in range(size)]
+
+
+def to_line(board: List[List[int]]) -> str:
+    """
+    Write a board as size * size characters on one line, with 0 for empty
+    cells, 81 characters for a 9x9 board
+    :param board: the board
+    :return: the line
+    """
+    return "".join(DIGITS[number] for row in board for number in row)
+
+
+def pack(board: List[List[int]]) -> bytes:
+    """
+    Pack a 9x9 board into RECORD bytes, 4 bits per cell
+    :param board: the board
+    :return: the record
+    """
+    if len(board) != 9:
+        raise ValueError("binary puzzle files only hold 9x9 boards")
+    cells = [number for row in board for number in row] + [0]
+    return bytes(cells[i] << 4 | cells[i + 1] for i in range(0, 82, 2))
+
+
+def unpack(record: bytes) -> List[List[int]]:
+    """
+    Unpack a record made by pack
+    :param record: RECORD bytes
+    :return: the board
+    """
+    cells = []
+    for byte in record:
+        cells.append(byte >> 4)
+        cells.append(byte & 0xF)
+    return [cells[row * 9:row * 9 + 9] for row in range(9)]
+
+
+def read_puzzles(path: str) -> Iterator[str]:
+    """
+    Stream the puzzles in a text or binary file one at a time, without
+    loading the whole file
+    :param path: file to read, - for standard input (text only)
+    :return: the puzzles as 81 character lines
+    """
+    if path != "-":
+        with open(path, "rb") as file:
+            binary = file.read(len(MAGIC)) == MAGIC
+        if binary:
+            with Corpus(path) as corpus:
+                for i in range(len(corpus)):
+                    yield to_line(corpus[i])
+            return
+    file = sys.stdin if path == "-" else open(path)
+    try:
+        for line in file:
+            fields = line.split()
+            if fields and not fields[0].startswith("#"):
+                yield fields[0]
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def read_boards(path: str) -> Iterator[List[List[int]]]:
+    """
+    Stream the puzzles in a text or binary file as boards
+    :param path: file to read, - for standard input (text only)
+    :return: the boards
+    """
+    for line in read_puzzles(path):
+        yield parse(line)
+
+
+def write_puzzles(path: str, boards: Iterable[List[List[int]]],
+                  binary: bool = False) -> int:
+    """
+    Write boards to a text or binary file as they come
+    :param path: file to write
+    :param boards: the boards
+    :param binary: write the packed binary format instead of text
+    :return: number of boards written
+    """
+    count = 0
+    with BinaryWriter(path) if binary else open(path, "w") as file:
+        for board in boards:
+            if binary:
+                file.write(board)
+            else:
+                file.write(to_line(board) + "\n")
+            count += 1
+    return count
+
+
+class BinaryWriter:
+    """
+    Writes boards to a binary puzzle file one at a time.
+
+    ---Attributes---
+    _file: the open file
+    """
+    _file: object
+
+    def __init__(self, path: str):
+        """
+        Create the file and write the header
+        :param path: file to write
+        """
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+
+    def write(self, board: List[List[int]]) -> None:
+        """
+        append a board to the file
+        :param board: the board
+        :return: None
+        """
+        self._file.write(pack(board))
+
+    def flush(self) -> None:
+        """
+        flush buffered boards to the file
+        :return: None
+        """
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        close the file
+        :return: None
+        """
+        self._file.close()
+
+    def __enter__(self) -> BinaryWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Corpus:
+    """
+    A binary puzzle file mapped into memory, giving random access to its
+    puzzles by index without reading the rest of the file.
+
+    ---Attributes---
+    _file: the open file
+    _map: the memory map of the file
+    _count: number of puzzles in the file
+    """
+    _file: object
+    _map: mmap.mmap
+    _count: int
+
+    def __init__(self, path: str):
+        """
+        Open and map a binary puzzle file
+        :param path: file to open
+        """
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("not a binary puzzle file: {}".format(path))
+        self._count = (len(self._map) - len(MAGIC)) // RECORD
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, index: int) -> bytes:
+        """
+        return the packed record of a puzzle. It is copied out of the map,
+        which only costs RECORD bytes, so no view on the map is left alive
+        to stop close from unmapping it
+        :param index: index of the puzzle
+        :return: RECORD bytes
+        """
+        if not 0 <= index < self._count:
+            raise IndexError("puzzle index out of range")
+        start = len(MAGIC) + index * RECORD
+        return self._map[start:start + RECORD]
+
+    def __getitem__(self, index: int) -> List[List[int]]:
+        """
+        return a puzzle as a board
+        :param index: index of the puzzle
+        :return: the board
+        """
+        return unpack(self.record(index))
+
+    def array(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        return a range of puzzles as an (N, 9, 9) uint8 array, e.g. for
+        vector.solve_batch
+        :param start: index of the first puzzle
+        :param stop: index after the last puzzle, defaults to the end
+        :return: the puzzles
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        start = min(start, stop)
+        packed = np.frombuffer(self._map, dtype=np.uint8,
+                               count=(stop - start) * RECORD,
+                               offset=len(MAGIC) + start * RECORD)
+        packed = packed.reshape(stop - start, RECORD)
+        cells = np.empty((stop - start, RECORD * 2), dtype=np.uint8)
+        cells[:, 0::2] = packed >> 4
+        cells[:, 1::2] = packed & 0xF
+        return cells[:, :81].reshape(stop - start, 9, 9)
+
+    def close(self) -> None:
+        """
+        unmap and close the file
+        :return: None
+        """
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> Corpus:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
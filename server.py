@@ -0,0 +1,462 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from board import *
+from generate import generate
+"""
+Solving as a service: an asyncio HTTP server answering JSON requests to
+solve, validate, count the solutions of and generate puzzles, written as
+one line of characters like everywhere else. Requests that need a solver
+are gathered into small batches and run on a pool of worker processes.
+
+    POST /solve      {"puzzle": "...", "engine": "dlx", "timeout": 1.5}
+    POST /validate   {"puzzle": "..."}
+    POST /count      {"puzzle": "...", "limit": 2}  (at most MAX_COUNT)
+    POST /generate   {"box": 3, "seed": 7, "symmetric": true}
+    GET  /health
+"""
+
+# longest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+# largest limit /count accepts
+MAX_COUNT = 10000
+
+# requests waiting for a worker, once this many are queued new ones are
+# turned away with 503 so a flood can not pile up without bound
+QUEUE_SIZE = 1024
+
+# most requests sent to a worker process at once
+BATCH_SIZE = 32
+
+# seconds the first request of a batch waits for others to join it
+BATCH_WAIT = 0.002
+
+# batches running or waiting in the pool per worker, past that the queue
+# fills up instead
+BATCHES_PER_WORKER = 2
+
+# seconds a request may take, from arrival to answer, unless it asks for
+# less
+TIMEOUT = 5.0
+
+# seconds past its timeout a request waits for its worker, so a search that
+# gives up at the deadline can still answer with how far it got
+GRACE = 0.05
+
+# endpoints run on the worker processes
+SOLVE = "solve"
+COUNT = "count"
+GENERATE = "generate"
+
+
+class Job:
+    """
+    A request waiting for a worker.
+
+    ---Attributes---
+    kind: SOLVE, COUNT or GENERATE
+    args: arguments for the worker
+    deadline: time.time() at which to give up on it
+    future: set to the status and reply once the job is done
+    """
+    kind: str
+    args: tuple
+    deadline: float
+    future: asyncio.Future
+
+    def __init__(self, kind: str, args: tuple, deadline: float,
+                 future: asyncio.Future):
+        self.kind = kind
+        self.args = args
+        self.deadline = deadline
+        self.future = future
+
+
+class Server:
+    """
+    The HTTP server, and the batcher feeding its worker processes.
+
+    ---Attributes---
+    timeout: longest a request may take, in seconds
+    batch_size: most jobs sent to a worker at once
+    batch_wait: seconds the first job of a batch waits for others
+    served: requests answered so far, by status code
+    _pool: the worker processes
+    _queue: jobs waiting for a worker, bounded
+    _slots: batches that may be in the pool at once
+    """
+    timeout: float
+    batch_size: int
+    batch_wait: float
+    served: Dict[int, int]
+    _pool: ProcessPoolExecutor
+    _queue: asyncio.Queue
+    _slots: asyncio.Semaphore
+
+    def __init__(self, workers: int = None, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, batch_wait: float = BATCH_WAIT,
+                 timeout: float = TIMEOUT):
+        """
+        :param workers: worker processes, defaults to the core count
+        :param queue_size: most jobs waiting for a worker
+        :param batch_size: most jobs sent to a worker at once
+        :param batch_wait: seconds the first job of a batch waits for others
+        :param timeout: longest a request may take, in seconds
+        """
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        workers = workers or os.cpu_count() or 1
+        self.served = {}
+        self._pool = ProcessPoolExecutor(workers)
+        self._queue = asyncio.Queue(queue_size)
+        self._slots = asyncio.Semaphore(workers * BATCHES_PER_WORKER)
+
+    async def serve(self, host: str, port: int) -> None:
+        """
+        answer requests until cancelled
+        :param host: address to listen on
+        :param port: port to listen on
+        :return: None
+        """
+        batcher = asyncio.ensure_future(self._batch())
+        server = await asyncio.start_server(self._connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._pool.shutdown(cancel_futures=True)
+
+    async def _connection(self, reader: asyncio.StreamReader,
+                          writer: asyncio.StreamWriter) -> None:
+        """
+        answer the requests of one connection, keeping it open between
+        them unless the client asks not to
+        :param reader: the connection's input
+        :param writer: the connection's output
+        :return: None
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep = (len(parts) == 3 and parts[2] == "HTTP/1.1"
+                        and headers.get("connection", "").lower() != "close")
+                length = headers.get("content-length", "0") or "0"
+                length = int(length) if length.isdigit() else -1
+                if len(parts) != 3:
+                    status, reply = HTTPStatus.BAD_REQUEST, _error(
+                        "malformed request line")
+                    keep = False
+                elif length < 0:
+                    status, reply = HTTPStatus.BAD_REQUEST, _error(
+                        "bad content-length")
+                    keep = False
+                elif length > MAX_BODY:
+                    status, reply = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, \
+                        _error("body is over {} bytes".format(MAX_BODY))
+                    keep = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, reply = await self._route(parts[0], parts[1],
+                                                      body)
+                self.served[status.value] = self.served.get(status.value,
+                                                            0) + 1
+                data = json.dumps(reply).encode()
+                writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json"
+                             "\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n"
+                             .format(status.value, status.phrase, len(data),
+                                     "keep-alive" if keep else "close")
+                             .encode() + data)
+                await writer.drain()
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str,
+                     body: bytes) -> Tuple[HTTPStatus, dict]:
+        """
+        answer one request
+        :param method: HTTP method
+        :param target: path asked for
+        :param body: request body, JSON
+        :return: the status and the reply
+        """
+        path = urlsplit(target).path.rstrip("/")
+        if path == "/health":
+            return HTTPStatus.OK, {"ok": True, "queued": self._queue.qsize(),
+                                   "served": self.served}
+        if path not in ("/solve", "/validate", "/count", "/generate"):
+            return HTTPStatus.NOT_FOUND, _error("no such endpoint")
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, _error("use POST")
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("the body must be a JSON object")
+            timeout = min(float(request.get("timeout", self.timeout)),
+                          self.timeout)
+            if path == "/validate":
+                return HTTPStatus.OK, _validate(parse(request["puzzle"]))
+            if path == "/generate":
+                job = (GENERATE, (request.get("seed"),
+                                  bool(request.get("symmetric", True)),
+                                  int(request.get("box", 3))))
+            elif path == "/count":
+                limit = int(request.get("limit", 2))
+                if limit > MAX_COUNT:
+                    raise ValueError("limit must be at most {}".format(
+                        MAX_COUNT))
+                job = (COUNT, (to_line(parse(request["puzzle"])), limit))
+            else:
+                engine = request.get("engine", BACKTRACK)
+                if engine not in ENGINES:
+                    raise ValueError("unknown solver engine: {}".format(
+                        engine))
+                job = (SOLVE, (to_line(parse(request["puzzle"])), engine))
+        except KeyError as error:
+            return HTTPStatus.BAD_REQUEST, _error("missing {}".format(error))
+        except (AttributeError, TypeError, ValueError) as error:
+            return HTTPStatus.BAD_REQUEST, _error(str(error))
+        return await self._submit(job[0], job[1], timeout)
+
+    async def _submit(self, kind: str, args: tuple,
+                      timeout: float) -> Tuple[HTTPStatus, dict]:
+        """
+        queue a job for the workers and wait for it
+        :param kind: SOLVE, COUNT or GENERATE
+        :param args: arguments for the worker
+        :param timeout: seconds to wait for it
+        :return: the status and the reply
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(Job(kind, args, time.time() + timeout,
+                                       future))
+        except asyncio.QueueFull:
+            return HTTPStatus.SERVICE_UNAVAILABLE, _error(
+                "too many requests waiting, try again later")
+        try:
+            return await asyncio.wait_for(future, timeout + GRACE)
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, _error(
+                "gave up after {} seconds".format(timeout))
+
+    async def _batch(self) -> None:
+        """
+        take jobs off the queue in batches, up to batch_size of them or as
+        many as turn up within batch_wait of the first, and send each batch
+        to the pool. Once every slot has a batch in it the queue is left to
+        fill up.
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            until = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                left = until - loop.time()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(),
+                                                        left))
+                except asyncio.TimeoutError:
+                    break
+            # jobs whose client already gave up are not worth sending
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+            await self._slots.acquire()
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[Job]) -> None:
+        """
+        run a batch on the pool and hand every job its result
+        :param batch: the jobs
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._pool, _run_batch,
+                [(job.kind, job.args, job.deadline) for job in batch])
+        except Exception as error:
+            results = [(HTTPStatus.INTERNAL_SERVER_ERROR.value,
+                        _error(str(error)))] * len(batch)
+        finally:
+            self._slots.release()
+        for job, (status, reply) in zip(batch, results):
+            if not job.future.done():
+                job.future.set_result((HTTPStatus(status), reply))
+
+
+def _run_batch(
+        jobs: List[Tuple[str, tuple, float]]) -> List[Tuple[int, dict]]:
+    """
+    run a batch of jobs, in a worker process, one after the other
+    :param jobs: the kind, arguments and deadline of every job
+    :return: the status and reply of every job, 504 with the partial
+    stats for a search that gave up at its deadline
+    """
+    results = []
+    for kind, args, deadline in jobs:
+        if time.time() > deadline:
+            results.append((HTTPStatus.GATEWAY_TIMEOUT.value,
+                            _error("timed out waiting for a worker")))
+            continue
+        try:
+            reply = _JOBS[kind](*args, deadline)
+        except ValueError as error:
+            results.append((HTTPStatus.BAD_REQUEST.value,
+                            _error(str(error))))
+            continue
+        if reply.get("gave_up"):
+            reply.update(_error("search ran past its deadline"))
+            results.append((HTTPStatus.GATEWAY_TIMEOUT.value, reply))
+        else:
+            results.append((HTTPStatus.OK.value, reply))
+    return results
+
+
+def _solve(line: str, engine: str, deadline: float) -> dict:
+    """
+    solve a puzzle
+    :param line: the puzzle
+    :param engine: solver engine to use, one of ENGINES
+    :param deadline: time.time() at which to give up
+    :return: the solution, null if there is none, why the search gave up,
+    null if it did not, and the solver's stats
+    """
+    board = Board(parse(line), engine=engine,
+                  limits=Limits(deadline=deadline))
+    solution = board.get_solution()
+    return {"solution": to_line(solution) if solution else None,
+            "gave_up": board.gave_up(),
+            "stats": board.get_stats().as_dict()}
+
+
+def _count(line: str, limit: int, deadline: float) -> dict:
+    """
+    count the solutions of a puzzle with dancing links, without keeping
+    the solutions themselves
+    :param line: the puzzle
+    :param limit: stop counting after this many
+    :param deadline: time.time() at which to give up
+    :return: the number of solutions, at most limit, found before the
+    search ended or gave up
+    """
+    links = DancingLinks(parse(line), limits=Limits(deadline=deadline))
+    count = links.count(max(limit, 1))
+    return {"count": count, "limit": limit,
+            "gave_up": links.stats.gave_up}
+
+
+def _generate(seed: Optional[int], symmetric: bool, box: int,
+              deadline: float) -> dict:
+    """
+    generate a graded puzzle with a unique solution. A 16x16 one can take
+    many seconds, so it gives up at the deadline like a search, freeing
+    its worker
+    :param seed: seed for repeatable puzzles, None for a random one
+    :param symmetric: keep the clues symmetric through the centre
+    :param box: side of a square, 3 for a 9x9 board
+    :param deadline: time.time() at which to give up
+    :return: the puzzle, its solution, difficulty and search nodes, or
+    why it gave up
+    """
+    if box not in (2, 3, 4):
+        raise ValueError("box must be 2, 3 or 4")
+    rng = random.Random(seed) if seed is not None else None
+    try:
+        puzzle = generate(rng, symmetric, box, Limits(deadline=deadline))
+    except GaveUp as error:
+        return {"gave_up": error.reason}
+    return {"puzzle": to_line(puzzle.board),
+            "solution": to_line(puzzle.solution),
+            "difficulty": puzzle.difficulty, "nodes": puzzle.nodes}
+
+
+def _validate(board: List[List[int]]) -> dict:
+    """
+    check a board, cheap enough to answer without a worker
+    :param board: the board, with 0 for empty cells
+    :return: whether no number repeats in a row, column or square, and
+    whether every cell is filled
+    """
+    valid = Board(board).is_valid()
+    complete = all(all(row) for row in board)
+    return {"valid": valid, "complete": complete, "solved": valid and complete}
+
+
+def _error(message: str) -> Dict[str, Any]:
+    """
+    the reply to a request that failed
+    :param message: what went wrong
+    :return: the reply
+    """
+    return {"error": message}
+
+
+_JOBS = {SOLVE: _solve, COUNT: _count, GENERATE: _generate}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the solver over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="port to listen on")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, defaults to the core count")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE,
+                        help="most requests sent to a worker at once")
+    parser.add_argument("--batch-wait", type=float, default=BATCH_WAIT * 1000,
+                        help="milliseconds a batch waits to fill up")
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE,
+                        help="requests waiting for a worker before new ones "
+                             "are turned away")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help="seconds a request may take")
+    args = parser.parse_args()
+
+    async def run():
+        server = Server(args.workers, args.queue, args.batch,
+                        args.batch_wait / 1000, args.timeout)
+        print("serving on http://{}:{}".format(args.host, args.port))
+        await server.serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
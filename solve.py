@@ -1,38 +1,405 @@
 from __future__ import annotations
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+from multiprocessing import Pool
+from typing import Iterable, Iterator, Optional
 from board import *
 """
 This is the standalone solving algorithm.
 """
 
+# the solution cache of this process, set up by _start_worker
+_cache: Optional[SolutionCache] = None
 
-def solve(board: Board) -> bool:
+
+class SolveResult:
+    """
+    The outcome of solving one puzzle of a batch.
+
+    ---Attributes---
+    index: position of the puzzle in the input
+    puzzle: the puzzle as an 81 character line
+    solution: the solution as an 81 character line, empty if there is none
+    or the solver gave up, see stats.gave_up
+    seconds: time spent solving
+    nodes: search nodes visited
+    unique: whether the solution is unique, None if that was not checked
+    stats: the work the solver did
+    error: why the puzzle could not be read, None if it was
+    """
+    index: int
+    puzzle: str
+    solution: str
+    seconds: float
+    nodes: int
+    unique: Optional[bool]
+    stats: Optional[SolveStats]
+    error: Optional[str]
+
+    def __init__(self, index: int, puzzle: str, solution: str,
+                 seconds: float, nodes: int, unique: bool = None,
+                 stats: SolveStats = None, error: str = None):
+        self.index = index
+        self.puzzle = puzzle
+        self.solution = solution
+        self.seconds = seconds
+        self.nodes = nodes
+        self.unique = unique
+        self.stats = stats
+        self.error = error
+
+
+def solve(board: Board, engine: str = BACKTRACK, hook: SolverHook = None,
+          limits: Limits = None) -> SolveStats:
+    # the stats say whether it was solved, whether it gave up, and how much
+    # work that took
     board.reset()
-    if helper_solve(board):
+    stats = SolveStats(engine)
+    if engine == DLX:
+        stats.solved = dlx_solve(board, stats, hook, limits)
+    elif engine != BACKTRACK:
+        raise ValueError("unknown solver engine: {}".format(engine))
+    else:
+        stats.solved = helper_solve(board, stats, hook, limits)
+    if stats.solved:
         board.print_board(board.get_board())
-        return True
-    return False
-
-
-def helper_solve(board: Board) -> bool:
-    # backtrack from the empty slot and try every number
-    candidates = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-    # we have an empty slot
-    pos = board.find_empty()
-    if pos[0] == -1:
-        if board.check_win():
-            return True
+    return stats
+
+
+def dlx_solve(board: Board, stats: SolveStats = None,
+              hook: SolverHook = None, limits: Limits = None) -> bool:
+    # solve a copy with dancing links, then fill the answer in
+    links = DancingLinks(board.get_board(), hook, limits)
+    solutions = links.search(1)
+    if stats is not None:
+        stats.merge(links.stats)
+        stats.gave_up = links.stats.gave_up
+    if not solutions:
+        return False
+    solution = solutions[0]
+    for row in range(board.get_size()):
+        for col in range(board.get_size()):
+            if board.get(row, col) == 0:
+                board.fill(row, col, solution[row][col])
+    return True
+
+
+def helper_solve(board: Board, stats: SolveStats = None,
+                 hook: SolverHook = None, limits: Limits = None) -> bool:
+    # backtrack with a stack of guesses instead of recursing, every fill is
+    # checked so once the board is full it is solved. If the limits run out
+    # the guesses are taken back and stats.gave_up says why. The player's
+    # notes are left alone while guessing
+    if stats is None:
+        stats = SolveStats(BACKTRACK)
+    start = time.perf_counter()
+    try:
+        with board.searching():
+            return _backtrack(board, stats, hook, limits)
+    except GaveUp as error:
+        stats.gave_up = error.reason
+        return False
+    finally:
+        searching = time.perf_counter() - start
+        stats.add_phase(SEARCH, searching)
+        if hook is not None:
+            hook.phase(SEARCH, searching)
+
+
+def _backtrack(board: Board, stats: SolveStats, hook: Optional[SolverHook],
+               limits: Optional[Limits]) -> bool:
+    # the search loop of helper_solve, counting its work into stats
+    if not board.is_valid():
+        return False
+    # each guess is the cell and the numbers left to try in it
+    stack = []
+    stats.nodes += 1
+    if hook is not None:
+        hook.node(0)
+    if limits is not None:
+        _check(board, stack, limits, stats.nodes)
+    pos = board.select_cell()
+    while pos[0] != -1:
+        stack.append((pos[0], pos[1], board.candidates(pos[0], pos[1])))
+        # take back guesses until one has a number left to try, every
+        # guess but the new one is taken back because it led nowhere
+        while stack:
+            row, col, numbers = stack[-1]
+            if board.get(row, col):
+                stats.backtracks += 1
+                if hook is not None:
+                    hook.backtrack(len(stack))
+            board.clear(row, col)
+            if numbers:
+                break
+            stack.pop()
         else:
             return False
+        board.fill(row, col, numbers.pop(0))
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, len(stack))
+        if hook is not None:
+            hook.node(len(stack))
+        if limits is not None:
+            _check(board, stack, limits, stats.nodes)
+        pos = board.select_cell()
+    return True
+
+
+def _check(board: Board, stack: list, limits: Limits, nodes: int) -> None:
+    """
+    check the limits of _backtrack, clearing its guesses before giving up
+    :param board: the board being solved
+    :param stack: the guesses in progress
+    :param limits: when to give up
+    :param nodes: search nodes visited so far
+    :return: None
+    """
+    try:
+        limits.check(nodes)
+    except GaveUp:
+        for row, col, numbers in stack:
+            board.clear(row, col)
+        raise
+
+
+def solve_many(puzzles: Iterable[str], workers: int = None,
+               chunksize: int = 64, engine: str = BACKTRACK,
+               ordered: bool = True, check_unique: bool = False,
+               cache: str = None, timeout: float = None,
+               max_nodes: int = None) -> Iterator[SolveResult]:
+    """
+    Solve a stream of puzzles on a pool of worker processes. A line that is
+    not a puzzle does not stop the rest, its result carries the error.
+    :param puzzles: puzzles as 81 character lines, read lazily
+    :param workers: number of processes, defaults to the number of cores,
+    1 solves in this process
+    :param chunksize: number of puzzles sent to a worker at a time
+    :param engine: solver engine to use, one of ENGINES
+    :param ordered: yield results in input order, otherwise as they finish
+    :param check_unique: also check every puzzle has only one solution
+    :param cache: file of a solution cache every process loads and looks
+    puzzles up in, so repeated puzzles are only solved once per process.
+    It is saved back at the end only when solving in this process.
+    :param timeout: seconds to spend on a puzzle before giving up on it
+    :param max_nodes: search nodes to visit on a puzzle before giving up
+    :return: a result for every puzzle
+    """
+    if engine not in ENGINES:
+        raise ValueError("unknown solver engine: {}".format(engine))
+    jobs = ((index, line, engine, check_unique, timeout, max_nodes)
+            for index, line in enumerate(puzzles))
+    if workers == 1:
+        _start_worker(cache)
+        for job in jobs:
+            yield _solve_job(job)
+        if _cache is not None:
+            _cache.save()
+        return
+    with Pool(workers, _start_worker, (cache,)) as pool:
+        if ordered:
+            results = pool.imap(_solve_job, jobs, chunksize)
+        else:
+            results = pool.imap_unordered(_solve_job, jobs, chunksize)
+        for result in results:
+            yield result
+
+
+def _start_worker(cache: Optional[str]) -> None:
+    """
+    set up the solution cache of a process
+    :param cache: file of the cache, None for no cache
+    :return: None
+    """
+    global _cache
+    _cache = SolutionCache(path=cache) if cache else None
+
+
+def _solve_job(job: Tuple[int, str, str, bool, Optional[float],
+                          Optional[int]]) -> SolveResult:
+    """
+    solve one puzzle of a batch, run in the worker processes
+    :param job: index of the puzzle, the puzzle, the engine to use,
+    whether to check uniqueness, and the timeout and node budget
+    :return: the result
+    """
+    index, line, engine, check_unique, timeout, max_nodes = job
+    start = time.perf_counter()
+    limits = None
+    if timeout is not None or max_nodes is not None:
+        limits = Limits(timeout, max_nodes)
+    try:
+        board = Board(parse(line), engine=engine, cache=_cache,
+                      limits=limits)
+    except ValueError as error:
+        return SolveResult(index, line.strip(), "",
+                           time.perf_counter() - start, 0,
+                           stats=SolveStats(engine), error=str(error))
+    board.get_solution()
+    unique = None
+    if check_unique and not board.gave_up():
+        counting = SolveStats(DLX)
+        unique = board.is_unique(counting)
+        if counting.gave_up:
+            unique = None
+    seconds = time.perf_counter() - start
+    solution = to_line(board.get_solution()) if board.get_solution() else ""
+    return SolveResult(index, line.strip(), solution, seconds,
+                       board.get_nodes(), unique, board.get_stats())
+
+
+def batch(args: argparse.Namespace) -> None:
+    """
+    Solve every puzzle in a file, printing one tab separated line per puzzle
+    with its index, solution (- if there is none, ? if the solver gave up
+    after --timeout or --max-nodes), milliseconds taken and nodes visited,
+    or for a line that is not a puzzle its index, ! and the error,
+    and with --unique whether the solution is unique, and with --stats the
+    backtracks, the search depth, the milliseconds spent propagating (or
+    building the matrix with --dlx) and the milliseconds spent searching,
+    then a summary on standard error. With --output the lines go to a file
+    instead, or with --binary the solutions are packed into a binary puzzle
+    file, an empty board standing in for puzzles with no solution.
+    :param args: parsed command line arguments
+    :return: None
+    """
+    engine = DLX if args.dlx else BACKTRACK
+    if args.binary:
+        out = BinaryWriter(args.output)
+    elif args.output:
+        out = open(args.output, "w")
     else:
-        for item in candidates:
-            if board.fill(pos[0], pos[1], item):
-                if helper_solve(board):
-                    return True
-                board.clear(pos[0], pos[1])
-        return False
+        out = sys.stdout
+    # binary files are looked up by index, so they have to stay in order
+    ordered = args.binary or not args.unordered
+    count = 0
+    gave_up = 0
+    errors = 0
+    total = SolveStats(engine)
+    start = time.perf_counter()
+    try:
+        for result in solve_many(read_puzzles(args.file), args.workers,
+                                 args.chunksize, engine, ordered,
+                                 args.unique, args.cache, args.timeout,
+                                 args.max_nodes):
+            count += 1
+            total.merge(result.stats)
+            if result.stats.gave_up:
+                gave_up += 1
+            if result.error is not None:
+                errors += 1
+            if args.binary:
+                out.write(parse(result.solution or "0" * 81))
+                continue
+            if result.error is not None:
+                print("{}\t!\t{}".format(result.index, result.error),
+                      file=out)
+                continue
+            solution = result.solution or "-"
+            if result.stats.gave_up:
+                solution = "?"
+            line = "{}\t{}\t{:.3f}\t{}".format(result.index, solution,
+                                               result.seconds * 1000,
+                                               result.nodes)
+            if args.unique and result.unique is None:
+                line += "\t?"
+            elif args.unique:
+                line += "\tunique" if result.unique else "\tnot unique"
+            if args.stats:
+                phases = result.stats.phases
+                line += "\t{}\t{}\t{:.3f}\t{:.3f}".format(
+                    result.stats.backtracks, result.stats.max_depth,
+                    (phases.get(PROPAGATE, 0.0)
+                     + phases.get(BUILD, 0.0)) * 1000,
+                    phases.get(SEARCH, 0.0) * 1000)
+            print(line, file=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print("solved {} puzzles in {:.2f}s, {:.1f} puzzles/s".format(
+        count, elapsed, count / elapsed if elapsed else 0), file=sys.stderr)
+    if gave_up:
+        print("gave up on {} puzzles".format(gave_up), file=sys.stderr)
+    if errors:
+        print("could not read {} puzzles".format(errors), file=sys.stderr)
+    if args.stats:
+        print("{} nodes, {} backtracks, max depth {}, {}".format(
+            total.nodes, total.backtracks, total.max_depth,
+            ", ".join("{} {:.2f}s".format(phase, seconds)
+                      for phase, seconds in sorted(total.phases.items()))),
+            file=sys.stderr)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Solve sudoku puzzles.")
+    parser.add_argument("file", nargs="?",
+                        help="text or binary file of puzzles, - for "
+                             "standard input, solves the bundled board if "
+                             "left out")
+    parser.add_argument("--dlx", action="store_true",
+                        help="use the dancing links engine")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, defaults to the core count")
+    parser.add_argument("--chunksize", type=int, default=64,
+                        help="puzzles sent to a worker at a time")
+    parser.add_argument("--unordered", action="store_true",
+                        help="print results as they finish")
+    parser.add_argument("--unique", action="store_true",
+                        help="also check every puzzle has one solution")
+    parser.add_argument("-o", "--output", default=None,
+                        help="file to write results to")
+    parser.add_argument("--binary", action="store_true",
+                        help="write the solutions to --output as a binary "
+                             "puzzle file")
+    parser.add_argument("--cache", default=None,
+                        help="solution cache file, puzzles seen before, "
+                             "even renamed, rotated or reordered, are not "
+                             "solved again")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds to spend on a puzzle before giving "
+                             "up on it")
+    parser.add_argument("--max-nodes", type=int, default=None,
+                        help="search nodes to visit on a puzzle before "
+                             "giving up on it")
+    parser.add_argument("--stats", action="store_true",
+                        help="also print backtracks, depth and phase times")
+    parser.add_argument("--trace", action="store_true",
+                        help="print every search event of the bundled "
+                             "board to standard error")
+    parser.add_argument("--profile", action="store_true",
+                        help="run in one process under cProfile and print "
+                             "the hottest functions to standard error")
+    args = parser.parse_args()
+    if args.binary and not args.output:
+        parser.error("--binary needs --output")
+    if args.profile:
+        args.workers = 1
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            run(args)
+        finally:
+            profiler.disable()
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats(
+                "cumulative").print_stats(25)
+        return
+    run(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    """
+    Solve the puzzle file given on the command line, or the bundled board
+    :param args: parsed command line arguments
+    :return: None
+    """
+    if args.file:
+        batch(args)
+        return
+
     board = [[6,0,2,3,8,0,0,0,4],
              [4,0,5,0,7,0,0,9,0],
              [0,0,3,0,5,0,0,0,0],
@@ -44,7 +411,15 @@ def main():
              [8,0,0,0,3,6,2,0,9]]
     bo = Board(board)
     bo.print_board(bo.get_board())
-    solve(bo)
+    limits = None
+    if args.timeout is not None or args.max_nodes is not None:
+        limits = Limits(args.timeout, args.max_nodes)
+    stats = solve(bo, DLX if args.dlx else BACKTRACK,
+                  TraceHook() if args.trace else None, limits)
+    if stats.gave_up:
+        print("gave up, out of {}".format(stats.gave_up), file=sys.stderr)
+    if args.stats or args.trace:
+        print(stats, file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -4,39 +4,77 @@ from typing import List, Tuple
 
 class Square:
     """
-    A 3x3 square. Each board should have 9 of such squares
+    A 3x3 square. Each board should have 9 of such squares, or box x box
+    squares of box x box cells on bigger boards. A square is a view on the
+    cells of its board, it holds no numbers of its own, so it always agrees
+    with the board.
 
     ---Attributes---
-    _square: three rows of 3 integers to represent a square
-    _original: the original square
+    _cells: the rows of the board the square looks at, anything that can be
+    indexed as cells[row][col], or a compact Grid
+    _row: row of the top left cell of the square on the board
+    _col: column of the top left cell of the square on the board
+    _box: side of the square
+    _grid: whether _cells is a Grid, which is read and written through its
+    get and set, so writing copies a buffer shared with a snapshot first
     """
+    __slots__ = ("_cells", "_row", "_col", "_box", "_grid")
 
-    _square: List[List[int]]
-    _original: List[List[int]]
+    _cells: List[List[int]]
+    _row: int
+    _col: int
+    _box: int
+    _grid: bool
 
-    def __init__(self, square):
+    def __init__(self, square, row: int = 0, col: int = 0, box: int = 3):
         """
         Initialize a square instance
-        :param square: numbers in this square
+        :param square: rows of the board this square is on, or just the 3
+        rows of 3 numbers of the square itself, or a Grid
+        :param row: row of the top left cell of the square on the board
+        :param col: column of the top left cell of the square on the board
+        :param box: side of the square
         """
-        # precondition: square is 3x3
-        self._square = square
-        self._original = []
-        for item in self._square:
-            self._original.append(item.copy())
+        self._cells = square
+        self._row = row
+        self._col = col
+        self._box = box
+        self._grid = hasattr(square, "set")
+
+    def get(self, row, col) -> int:
+        """
+        Return the number at a position of this square
+        :param row: row of the cell within the square
+        :param col: column of the cell within the square
+        :return: number at that cell
+        """
+        if self._grid:
+            return self._cells.get(self._row + row, self._col + col)
+        return self._cells[self._row + row][self._col + col]
+
+    def numbers(self) -> List[int]:
+        """
+        Return the numbers of this square in row major order
+        :return: numbers, with 0 for empty cells
+        """
+        box = self._box
+        if self._grid:
+            return [self._cells.get(self._row + i // box, self._col + i % box)
+                    for i in range(box * box)]
+        return [self._cells[self._row + i // box][self._col + i % box]
+                for i in range(box * box)]
 
     def validate(self) -> bool:
         """
         Check if this square breaks the rule of sudoku
         :return: true or false
         """
-        lst = []
-        for row in self._square:
-            for col in row:
-                if col != 0 and col in lst:
+        seen = set()
+        for col in self.numbers():
+            if col != 0:
+                if col in seen:
                     return False
-                else:
-                    lst.append(col)
+                seen.add(col)
         return True
 
     def fill(self, row, col, number) -> bool:
@@ -47,14 +85,27 @@ class Square:
         :param number: number to fill
         :return: true on success false otherwise
         """
-        if self._square[row][col] != 0:
+        if self.get(row, col) != 0:
+            return False
+        if number in self.numbers():
             return False
-        for item in self._square:
-            if number in item:
-                return False
-        self._square[row][col] = number
+        self.put(row, col, number)
         return True
 
+    def put(self, row, col, number) -> None:
+        """
+        Write a number into a position without checking it against the rest
+        of the square, used when the board has already checked the move
+        :param row: row of the cell
+        :param col: column of the cell
+        :param number: number to write
+        :return: None
+        """
+        if self._grid:
+            self._cells.set(self._row + row, self._col + col, number)
+            return
+        self._cells[self._row + row][self._col + col] = number
+
     def clear(self, row, col) -> None:
         """
         set the given cell to 0
@@ -62,14 +113,12 @@ class Square:
         :param col: col of cell
         :return: None
         """
-        self._square[row][col] = 0
+        self.put(row, col, 0)
 
     def reset(self) -> None:
         """
-        reset this square to the original square after initially finding the
-        solutions
+        A square only shows the cells of its board, so resetting the board
+        resets the square, there is nothing to do here
         :return: None
         """
-        self._square = []
-        for item in self._original:
-            self._square.append(item.copy())
+        return
@@ -0,0 +1,274 @@
+from __future__ import annotations
+import sys
+import threading
+import time
+from typing import Dict, Optional, TextIO
+"""
+Counting the work a solver engine does, and hooks for watching it search.
+"""
+
+# phases of a solve that are timed separately
+BUILD = "build"
+PROPAGATE = "propagate"
+SEARCH = "search"
+CACHE = "cache"
+
+# reasons a search gives up before it is done, see Limits
+OUT_OF_TIME = "time"
+OUT_OF_NODES = "nodes"
+CANCELLED = "cancelled"
+
+
+class SolveStats:
+    """
+    The work one solve took, so a slow puzzle can be told apart from slow
+    code.
+
+    ---Attributes---
+    engine: the solver engine that did the work
+    solved: whether a solution was found
+    nodes: search nodes visited, 1 if no guess was needed
+    backtracks: guesses taken back because they led to a contradiction
+    max_depth: most guesses in progress at once
+    phases: seconds spent in each phase, BUILD, PROPAGATE, SEARCH and
+    CACHE, looking the puzzle up in a solution cache
+    techniques: how many times each logical technique made progress
+    gave_up: why the search stopped before it was done, one of OUT_OF_TIME,
+    OUT_OF_NODES and CANCELLED, None if it ran to the end. A search that
+    gave up is not solved, but that says nothing about the puzzle
+    """
+    engine: str
+    solved: bool
+    gave_up: Optional[str]
+    nodes: int
+    backtracks: int
+    max_depth: int
+    phases: Dict[str, float]
+    techniques: Dict[str, int]
+
+    def __init__(self, engine: str = ""):
+        self.engine = engine
+        self.solved = False
+        self.gave_up = None
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.phases = {}
+        self.techniques = {}
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        """
+        add time spent in a phase
+        :param phase: name of the phase
+        :param seconds: time spent
+        :return: None
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def merge(self, other: SolveStats) -> None:
+        """
+        add the work of another solve to this one, e.g. to total a batch
+        :param other: stats of the other solve
+        :return: None
+        """
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for phase, seconds in other.phases.items():
+            self.add_phase(phase, seconds)
+        for technique, count in other.techniques.items():
+            self.techniques[technique] = (self.techniques.get(technique, 0)
+                                          + count)
+
+    def seconds(self) -> float:
+        """
+        return the time spent in every phase together
+        :return: seconds
+        """
+        return sum(self.phases.values())
+
+    def as_dict(self) -> dict:
+        """
+        return the stats as a dictionary of plain values, e.g. for json
+        :return: the stats
+        """
+        return {"engine": self.engine, "solved": self.solved,
+                "gave_up": self.gave_up, "nodes": self.nodes,
+                "backtracks": self.backtracks, "max_depth": self.max_depth,
+                "phases": dict(self.phases),
+                "techniques": dict(self.techniques)}
+
+    def __bool__(self) -> bool:
+        """
+        the stats are true when the puzzle was solved, so code that tested
+        what solve.solve returned before it returned stats still works
+        :return: whether a solution was found
+        """
+        return self.solved
+
+    def __repr__(self) -> str:
+        return ("SolveStats(engine={!r}, solved={}, gave_up={!r}, nodes={}, "
+                "backtracks={}, max_depth={}, seconds={:.6f})".format(
+                    self.engine, self.solved, self.gave_up, self.nodes,
+                    self.backtracks, self.max_depth, self.seconds()))
+
+
+class CancelToken:
+    """
+    A flag another thread raises to stop a search. The search only looks at
+    it between nodes, so it stops soon after, not at once.
+
+    ---Attributes---
+    _event: set once cancelled
+    """
+    _event: threading.Event
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        ask every search holding this token to stop
+        :return: None
+        """
+        self._event.set()
+
+    def cancelled(self) -> bool:
+        """
+        return whether the token has been cancelled
+        :return: true once cancel has been called
+        """
+        return self._event.is_set()
+
+
+class GaveUp(Exception):
+    """
+    Raised inside a search when its Limits run out. Engines catch it, put
+    the board back the way they found it and record the reason in their
+    stats, so their callers never see it. Work made of many searches with
+    no partial result to give, like generating a puzzle, raises it again.
+
+    ---Attributes---
+    reason: OUT_OF_TIME, OUT_OF_NODES or CANCELLED
+    """
+    reason: str
+
+    def __init__(self, reason: str):
+        super().__init__("search gave up: out of {}".format(reason)
+                         if reason != CANCELLED else "search cancelled")
+        self.reason = reason
+
+
+class Limits:
+    """
+    How long a search may run: a wall clock deadline, a number of search
+    nodes and a cancellation token, any of which can be left out. Engines
+    are given None instead of limits by default and skip the check
+    altogether, like hooks.
+
+    ---Attributes---
+    deadline: time.time() at which to give up, None for no deadline. It is
+    wall clock time so it means the same in every process
+    max_nodes: search nodes to visit before giving up, None for no limit
+    token: gives up once cancelled, None for no token
+    """
+    deadline: Optional[float]
+    max_nodes: Optional[int]
+    token: Optional[CancelToken]
+
+    def __init__(self, timeout: float = None, max_nodes: int = None,
+                 token: CancelToken = None, deadline: float = None):
+        """
+        :param timeout: seconds from now to give up after
+        :param max_nodes: search nodes to visit before giving up
+        :param token: gives up once cancelled
+        :param deadline: time.time() at which to give up, the earlier of
+        it and timeout counts if both are given
+        """
+        if timeout is not None:
+            end = time.time() + timeout
+            deadline = end if deadline is None else min(deadline, end)
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.token = token
+
+    def check(self, nodes: int) -> None:
+        """
+        called by an engine at every search node, raises GaveUp if any limit
+        has run out
+        :param nodes: search nodes visited so far
+        :return: None
+        """
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            raise GaveUp(OUT_OF_NODES)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise GaveUp(OUT_OF_TIME)
+        if self.token is not None and self.token.cancelled():
+            raise GaveUp(CANCELLED)
+
+
+class SolverHook:
+    """
+    Receives events from a solver engine while it searches. Every method
+    does nothing, so subclass it and override the events you need. Engines
+    are given None instead of a hook by default and skip the calls
+    altogether, so the hot path pays nothing unless a hook is attached.
+    """
+
+    def node(self, depth: int) -> None:
+        """
+        called when the search enters a node
+        :param depth: guesses in progress, 0 at the root
+        :return: None
+        """
+
+    def backtrack(self, depth: int) -> None:
+        """
+        called when a guess is taken back
+        :param depth: guesses in progress before taking it back
+        :return: None
+        """
+
+    def technique(self, name: str, progress: int) -> None:
+        """
+        called when a logical technique makes progress
+        :param name: the technique, see logic.py
+        :param progress: cells filled or candidates removed
+        :return: None
+        """
+
+    def phase(self, name: str, seconds: float) -> None:
+        """
+        called when a timed phase ends
+        :param name: the phase, one of BUILD, PROPAGATE and SEARCH
+        :param seconds: time spent in it
+        :return: None
+        """
+
+
+class TraceHook(SolverHook):
+    """
+    A hook that writes every event to a stream, one per line.
+
+    ---Attributes---
+    out: stream to write to
+    """
+    out: TextIO
+
+    def __init__(self, out: TextIO = None):
+        """
+        :param out: stream to write to, defaults to standard error
+        """
+        self.out = out or sys.stderr
+
+    def node(self, depth: int) -> None:
+        print("node\t{}".format(depth), file=self.out)
+
+    def backtrack(self, depth: int) -> None:
+        print("backtrack\t{}".format(depth), file=self.out)
+
+    def technique(self, name: str, progress: int) -> None:
+        print("technique\t{}\t{}".format(name, progress), file=self.out)
+
+    def phase(self, name: str, seconds: float) -> None:
+        print("phase\t{}\t{:.6f}".format(name, seconds), file=self.out)
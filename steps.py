@@ -0,0 +1,160 @@
+from __future__ import annotations
+import queue
+import threading
+from typing import List, Optional, Tuple
+from board import *
+"""
+A backtracking solve that runs in a background thread and reports every
+step it takes as an event, so the GUI can animate it at its own pace
+instead of drawing from inside the search.
+"""
+
+# kinds of step events, each event is (kind, row, col, number)
+TRY = "try"
+PLACE = "place"
+CLEAR = "clear"
+# the last event, number is 1 if the board was solved and 0 if not
+DONE = "done"
+
+# events waiting to be shown, once this many are queued the solver waits
+# for the GUI to catch up instead of running ahead of the animation
+QUEUE_SIZE = 256
+
+# a step event, (kind, row, col, number)
+Step = Tuple[str, int, int, int]
+
+
+class Cancelled(Exception):
+    """
+    Raised inside the solver thread when the solve is cancelled.
+    """
+
+
+class StepSolver(threading.Thread):
+    """
+    Solves a copy of a board by backtracking in a background thread, trying
+    the numbers of each cell in order like the visual solve always did, and
+    puts a step event into a queue for every number tried, placed or taken
+    back. The board itself is left alone, whoever reads the events applies
+    them to it.
+
+    ---Attributes---
+    events: the step events, in the order they happened
+    _board: the copy being solved
+    _token: cancelled when the solve should stop
+    """
+    events: queue.Queue
+    _board: Board
+    _token: CancelToken
+
+    def __init__(self, board: List[List[int]], size: int = QUEUE_SIZE,
+                 token: CancelToken = None):
+        """
+        :param board: the board to solve, with 0 for empty cells
+        :param size: most events queued before the solver waits
+        :param token: stops the solve once cancelled, e.g. shared with other
+        searches, defaults to a token of its own
+        """
+        super().__init__(daemon=True)
+        self.events = queue.Queue(size)
+        self._board = Board(board)
+        self._token = token or CancelToken()
+
+    def cancel(self) -> None:
+        """
+        stop the solve, it ends without a DONE event
+        :return: None
+        """
+        self._token.cancel()
+
+    def cancelled(self) -> bool:
+        """
+        Check whether the solve was cancelled
+        :return: true if it was, false otherwise
+        """
+        return self._token.cancelled()
+
+    def next_event(self, wait: float = 0) -> Optional[Step]:
+        """
+        take the next step event
+        :param wait: seconds to wait for it, 0 to not wait
+        :return: the event, None if there is none yet
+        """
+        try:
+            if wait:
+                return self.events.get(timeout=wait)
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+    def run(self) -> None:
+        try:
+            solved = self._solve()
+            self._emit(DONE, -1, -1, 1 if solved else 0)
+        except Cancelled:
+            pass
+
+    def _emit(self, kind: str, row: int, col: int, number: int) -> None:
+        """
+        queue a step event, waiting while the queue is full
+        :param kind: TRY, PLACE, CLEAR or DONE
+        :param row: row of the cell
+        :param col: column of the cell
+        :param number: number tried or placed
+        :return: None
+        """
+        while True:
+            if self._token.cancelled():
+                raise Cancelled()
+            try:
+                self.events.put((kind, row, col, number), timeout=0.05)
+                return
+            except queue.Full:
+                continue
+
+    def _solve(self) -> bool:
+        """
+        backtrack with a stack of guesses instead of recursing, each guess
+        is [row, col, next number to try], every fill is checked so once
+        the board is full it is solved
+        :return: true if the board was solved, false otherwise
+        """
+        board = self._board
+        if not board.is_valid():
+            return False
+        stack = []
+        pos = board.select_cell()
+        while pos[0] != -1:
+            stack.append([pos[0], pos[1], 1])
+            # take back guesses until one has a number that fits
+            while stack:
+                guess = stack[-1]
+                row, col = guess[0], guess[1]
+                if board.get(row, col):
+                    board.clear(row, col)
+                    self._emit(CLEAR, row, col, 0)
+                if self._try_numbers(guess):
+                    break
+                stack.pop()
+            else:
+                return False
+            pos = board.select_cell()
+        return True
+
+    def _try_numbers(self, guess: List[int]) -> bool:
+        """
+        Try the numbers left for a guess in order until one fits
+        :param guess: row and column of the cell and the next number to try,
+        which is moved past the number that fits
+        :return: true if a number fit, false once none are left
+        """
+        board = self._board
+        row, col = guess[0], guess[1]
+        while guess[2] <= board.get_size():
+            item = guess[2]
+            guess[2] += 1
+            self._emit(TRY, row, col, item)
+            if board.fill(row, col, item):
+                self._emit(PLACE, row, col, item)
+                return True
+        return False
@@ -0,0 +1,209 @@
+from __future__ import annotations
+import time
+from typing import Tuple
+import numpy as np
+from dlx import DancingLinks
+from stats import *
+"""
+Solving many puzzles at once with numpy. Singles are applied to the whole
+batch with array operations and only the puzzles that logic can not finish
+are searched one at a time.
+"""
+
+FULL = 0x1FF
+
+# row, column and square of every cell, cells are numbered row * 9 + col
+CELL_ROW = np.arange(81) // 9
+CELL_COL = np.arange(81) % 9
+CELL_BOX = CELL_ROW // 3 * 3 + CELL_COL // 3
+
+# number of set bits for every 9-bit mask
+BIT_COUNT = np.array([bin(i).count("1") for i in range(512)], dtype=np.uint8)
+
+# the number a mask stands for if it has exactly one bit set, 0 otherwise
+SINGLE = np.array([i.bit_length() if BIT_COUNT[i] == 1 else 0
+                   for i in range(512)], dtype=np.uint8)
+
+# the bit of every number, with 0 for an empty cell
+BIT = np.array([0] + [1 << i for i in range(9)], dtype=np.uint16)
+
+# the bit of every byte, 0 for anything that is not a number from 1 to 9
+BYTE_BIT = np.zeros(256, dtype=np.uint16)
+BYTE_BIT[:10] = BIT
+
+# grids valid_grids checks at once, so a file of millions of them only
+# needs a few tens of megabytes of work space
+GRID_CHUNK = 1 << 16
+
+
+def unit_masks(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                            np.ndarray]:
+    """
+    The numbers used in every row, column and square of every puzzle
+    :param values: (N, 81) array of numbers, 0 for empty cells
+    :return: three (N, 9) uint16 arrays of masks, for rows, columns and
+    squares, bit i stands for the number i + 1
+    """
+    return _or_units(BIT[values].reshape(values.shape[0], 9, 9))
+
+
+def _or_units(bits: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                         np.ndarray]:
+    """
+    or together the bits of every row, column and square
+    :param bits: (N, 9, 9) array of the bit of every cell
+    :return: three (N, 9) arrays of masks, for rows, columns and squares
+    """
+    n = bits.shape[0]
+    rows = np.bitwise_or.reduce(bits, axis=2)
+    cols = np.bitwise_or.reduce(bits, axis=1)
+    boxes = np.bitwise_or.reduce(
+        np.bitwise_or.reduce(bits.reshape(n, 3, 3, 3, 3), axis=4), axis=2)
+    return rows, cols, boxes.reshape(n, 9)
+
+
+def candidates(values: np.ndarray) -> np.ndarray:
+    """
+    The numbers that can legally go in every empty cell of every puzzle
+    :param values: (N, 81) array of numbers, 0 for empty cells
+    :return: (N, 81) uint16 array of masks, 0 for filled cells
+    """
+    rows, cols, boxes = unit_masks(values)
+    used = rows[:, CELL_ROW] | cols[:, CELL_COL] | boxes[:, CELL_BOX]
+    cands = ~used & FULL
+    cands[values != 0] = 0
+    return cands
+
+
+def propagate_batch(values: np.ndarray) -> np.ndarray:
+    """
+    Apply naked and hidden singles to every puzzle until none of them
+    change. Puzzles with no solution may end up with clashing numbers, use
+    valid_batch to find them.
+    :param values: (N, 81) array of numbers, 0 for empty cells, filled in
+    place
+    :return: values
+    """
+    active = np.arange(values.shape[0])
+    while active.size:
+        current = values[active]
+        cands = candidates(current)
+        empty = current == 0
+        # naked singles
+        assign = SINGLE[cands]
+        # hidden singles, numbers that fit exactly one cell of a unit
+        n = current.shape[0]
+        grid = cands.reshape(n, 9, 9)
+        hidden = (_once(grid)[:, CELL_ROW]
+                  | _once(grid.transpose(0, 2, 1))[:, CELL_COL]
+                  | _once(grid.reshape(n, 3, 3, 3, 3).transpose(0, 1, 3, 2, 4)
+                          .reshape(n, 9, 9))[:, CELL_BOX])
+        hidden = SINGLE[cands & hidden]
+        assign = np.where(assign == 0, hidden, assign)
+        assign[~empty] = 0
+        changed = assign.any(axis=1)
+        current[changed] += assign[changed]
+        values[active] = current
+        # a puzzle with an empty cell and nothing left to put in it is stuck
+        stuck = (empty & (cands == 0)).any(axis=1)
+        active = active[changed & ~stuck]
+    return values
+
+
+def _once(units: np.ndarray) -> np.ndarray:
+    """
+    The numbers that are a candidate in exactly one cell of each unit
+    :param units: (N, 9, 9) array of candidate masks, one unit per row
+    :return: (N, 9) uint16 array of masks
+    """
+    once = np.zeros(units.shape[:2], dtype=np.uint16)
+    twice = np.zeros(units.shape[:2], dtype=np.uint16)
+    for i in range(9):
+        twice |= once & units[:, :, i]
+        once |= units[:, :, i]
+    return once & ~twice
+
+
+def valid_batch(values: np.ndarray) -> np.ndarray:
+    """
+    Check that no number appears twice in a row, column or square
+    :param values: (N, 81) array of numbers, 0 for empty cells
+    :return: (N,) bool array, true for puzzles without clashes
+    """
+    n = values.shape[0]
+    rows, cols, boxes = unit_masks(values)
+    filled = (values != 0).reshape(n, 9, 9)
+    in_box = filled.reshape(n, 3, 3, 3, 3).sum(axis=(2, 4)).reshape(n, 9)
+    # a unit has no clash exactly when it has one bit per filled cell
+    return ((BIT_COUNT[rows] == filled.sum(axis=2)).all(axis=1)
+            & (BIT_COUNT[cols] == filled.sum(axis=1)).all(axis=1)
+            & (BIT_COUNT[boxes] == in_box).all(axis=1))
+
+
+def valid_grids(grids: np.ndarray, chunk: int = GRID_CHUNK) -> np.ndarray:
+    """
+    Check that completed grids are solved, every row, column and square
+    holding each number from 1 to 9 once, e.g. the solutions from a
+    Corpus. Nine cells can only hold all nine numbers if none is missing or
+    repeated, so it is enough that every unit's mask is full. Empty cells
+    and anything that is not a number from 1 to 9 make a grid invalid.
+    :param grids: (N, 81) or (N, 9, 9) array of numbers, read as bytes
+    :param chunk: grids checked at once, bounds the memory used
+    :return: (N,) bool array, true for the solved grids
+    """
+    n = grids.shape[0]
+    grids = grids.reshape(n, 81)
+    valid = np.empty(n, dtype=bool)
+    for start in range(0, n, chunk):
+        part = grids[start:start + chunk]
+        rows, cols, boxes = _or_units(
+            BYTE_BIT[part.astype(np.uint8, copy=False)].reshape(-1, 9, 9))
+        valid[start:start + chunk] = ((rows == FULL).all(axis=1)
+                                      & (cols == FULL).all(axis=1)
+                                      & (boxes == FULL).all(axis=1))
+    return valid
+
+
+def solve_batch(puzzles: np.ndarray, search: bool = True,
+                stats: SolveStats = None,
+                limits: Limits = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solve a stack of puzzles, with singles applied to the whole batch at
+    once and dancing links search for the rest
+    :param puzzles: (N, 9, 9) array of numbers, 0 for empty cells
+    :param search: search the puzzles logic can not finish, otherwise they
+    are left partly filled and reported as unsolved
+    :param stats: if given, the work done is added to it, with the batch
+    propagation as the PROPAGATE phase and the search stats of every
+    puzzle that needed it
+    :param limits: when to give up searching, the deadline and token are
+    shared by the whole batch and the node budget is for each puzzle. The
+    puzzles given up on are left partly filled and reported as unsolved,
+    and stats.gave_up says why
+    :return: (N, 9, 9) uint8 array of solutions and an (N,) bool array that
+    is true for the puzzles that were solved
+    """
+    start = time.perf_counter()
+    n = puzzles.shape[0]
+    values = puzzles.astype(np.uint8).reshape(n, 81)
+    valid = valid_batch(values)
+    propagate_batch(values)
+    valid &= valid_batch(values)
+    solved = valid & (values != 0).all(axis=1)
+    if stats is not None:
+        stats.add_phase(PROPAGATE, time.perf_counter() - start)
+    if search:
+        for index in np.flatnonzero(valid & ~solved):
+            links = DancingLinks(values[index].reshape(9, 9).tolist(),
+                                 limits=limits)
+            solutions = links.search(1)
+            if stats is not None:
+                stats.merge(links.stats)
+                stats.gave_up = links.stats.gave_up or stats.gave_up
+            if solutions:
+                values[index] = np.array(solutions[0],
+                                         dtype=np.uint8).reshape(81)
+                solved[index] = True
+    if stats is not None:
+        stats.solved = bool(solved.all())
+    return values.reshape(n, 9, 9), solved